@@ -0,0 +1,342 @@
+"""Benchmark every API route and Socket.IO event at several dataset sizes.
+
+    python bench_api.py [--scales 10k,100k,1M] [--repeat 20] [--output bench_results.json]
+    python bench_api.py --compare old.json new.json
+
+For each scale the database given by --database (a scratch SQLite file by
+default, never DATABASE_URL) is regenerated with generate_data.py. Each
+request in REQUESTS then runs --repeat times through Flask's test client.
+The results hold the p50/p95/p99 latency, the SQL statements per request
+and the peak Python memory of one extra traced run. They are written as JSON
+so two versions can be compared with --compare.
+
+Some clients stay joined to a project room the whole time, so the write
+routes include the cost of their broadcasts.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import event
+
+from factory import create_app
+from generate_data import generate
+from models import ChangeLog, ProjectTaskCount, Task, db
+
+# Route excluded from the run, with the reason
+SKIPPED = {'api.reseed_demo_data': 'replaces the generated dataset with the demo data',
+           'api.retry_job': 'needs a dead job, which a healthy run does not leave'}
+
+
+def json_body(factory):
+    return lambda ctx, i: {'json': factory(ctx, i)}
+
+
+def bulk_update_items(ctx, i):
+    first = 1 + i * 100 % max(1, ctx['tasks'] - 100)
+    return {'tasks': [{'id': task_id, 'status': ('todo', 'in_progress', 'completed')[i % 3]}
+                      for task_id in range(first, first + 100)]}
+
+
+def import_body(ctx, i):
+    lines = (json.dumps({'title': f'Imported {i}-{n}', 'project_id': ctx['project_id']})
+             for n in range(1000))
+    return {'data': '\n'.join(lines).encode()}
+
+
+# (method, url template, request kwargs factory). Templates are the names
+# results are keyed by; {placeholders} come from the dataset context.
+REQUESTS = [
+    ('GET', '/api/tasks?limit=50', None),
+    ('GET', '/api/tasks?limit=50&fields=id,title,status', None),
+    ('GET', '/api/tasks?limit=50&order_by=updated_at', None),
+    ('GET', '/api/tasks?project_id={project_id}', None),
+    ('GET', '/api/tasks?project_id={project_id}&status=todo&limit=50', None),
+    ('GET', '/api/tasks?project_id={project_id}&status=todo&order_by=rank&limit=50', None),
+    ('GET', '/api/tasks?assignee_id={user_id}&limit=50', None),
+    ('GET', '/api/projects?limit=50', None),
+    ('GET', '/api/projects/{project_id}', None),
+    ('GET', '/api/users?limit=50', None),
+    ('GET', '/api/dashboard/stats', None),
+    ('GET', '/api/realtime/stats', None),
+    ('GET', '/api/jobs', None),
+    ('GET', '/api/metrics', None),
+    ('GET', '/api/sync?since={recent_change}', None),
+    ('GET', '/api/search?q=billing', None),
+    ('GET', '/api/search?q=task 4242', None),
+    ('GET', '/api/search?q=pay&project_id={project_id}', None),
+    ('GET', '/api/analytics/time?period=day', None),
+    ('GET', '/api/analytics/time?period=week&project_id={project_id}&group_by=user', None),
+    ('GET', '/api/analytics/time?period=month&user_id={user_id}&group_by=project', None),
+    ('GET', '/api/analytics/time?task_id={task_id}', None),
+    ('GET', '/api/analytics/burndown?project_id={project_id}', None),
+    ('GET', '/api/analytics/velocity', None),
+    ('GET', '/api/export/tasks?project_id={project_id}', None),
+    ('GET', '/api/export/time_entries?project_id={project_id}', None),
+    ('POST', '/api/auth/register', json_body(lambda ctx, i: {
+        'name': f'Bench {i}', 'email': f'bench{ctx["run"]}-{i}@example.com', 'password': 'x'})),
+    ('POST', '/api/auth/login', json_body(lambda ctx, i: {'email': 'user2@example.com'})),
+    ('POST', '/api/projects', json_body(lambda ctx, i: {'name': f'Bench project {i}'})),
+    ('POST', '/api/tasks', json_body(lambda ctx, i: {
+        'title': f'Bench task {i}', 'project_id': ctx['project_id'], 'assignee_id': ctx['user_id']})),
+    ('PUT', '/api/tasks/{task_id}', json_body(lambda ctx, i: {
+        'status': ('todo', 'in_progress', 'completed')[i % 3]})),
+    ('POST', '/api/tasks/{task_id}/move', json_body(lambda ctx, i: {
+        'status': ('todo', 'in_progress', 'completed')[i % 3]})),
+    ('POST', '/api/tasks/bulk', json_body(lambda ctx, i: {'tasks': [
+        {'title': f'Bench bulk {i}-{n}', 'project_id': ctx['project_id']} for n in range(100)]})),
+    ('PATCH', '/api/tasks/bulk', json_body(bulk_update_items)),
+    ('POST', '/api/import/tasks?format=ndjson', import_body),
+]
+
+SOCKET_EVENTS = ('connect', 'join_project', 'leave_project', 'disconnect')
+
+
+def parse_scale(text):
+    text = text.strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def percentile(samples, pct):
+    # Nearest rank
+    ordered = sorted(samples)
+    return ordered[max(0, -(-len(ordered) * pct // 100) - 1)]
+
+
+def summarize(samples, queries=None, peak=None, status=None):
+    result = {
+        'runs': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3)
+    }
+    if queries is not None:
+        result['queries'] = queries
+    if peak is not None:
+        result['peak_mb'] = round(peak / 1e6, 3)
+    if status is not None:
+        result['status'] = status
+    return result
+
+
+def dataset_context():
+    # A median-sized project keeps the per-project requests representative;
+    # the hottest projects hold a large share of all tasks by design
+    sizes = db.session.query(ProjectTaskCount.project_id, db.func.sum(ProjectTaskCount.count)) \
+        .group_by(ProjectTaskCount.project_id).order_by(db.func.sum(ProjectTaskCount.count)).all()
+    project_id = sizes[len(sizes) // 2][0]
+    task_id = db.session.query(db.func.min(Task.id)).filter(Task.project_id == project_id).scalar()
+    latest = db.session.query(db.func.max(ChangeLog.id)).scalar() or 0
+    return {'project_id': project_id, 'task_id': task_id, 'user_id': 2,
+            'tasks': db.session.query(db.func.max(Task.id)).scalar(),
+            'recent_change': max(0, latest - 500)}
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.record)
+
+    def record(self, *args):
+        self.count += 1
+
+    def close(self):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+
+def run_request(client, counter, method, url, kwargs):
+    counter.count = 0
+    started = time.perf_counter()
+    response = client.open(url, method=method, buffered=True, **kwargs)
+    elapsed = time.perf_counter() - started
+    return elapsed, counter.count, response.status_code
+
+
+def bench_requests(client, engine, ctx, listeners, args):
+    counter = QueryCounter(engine)
+    results = {}
+    iteration = 0
+    try:
+        for method, template, factory in REQUESTS:
+            url = template.format(**ctx)
+            samples, queries, status = [], [], None
+            case_started = time.perf_counter()
+            while len(samples) < args.repeat and \
+                    (len(samples) < 3 or time.perf_counter() - case_started < args.max_seconds):
+                iteration += 1
+                kwargs = factory(ctx, iteration) if factory else {}
+                elapsed, count, status = run_request(client, counter, method, url, kwargs)
+                samples.append(elapsed)
+                queries.append(count)
+
+            iteration += 1
+            kwargs = factory(ctx, iteration) if factory else {}
+            tracemalloc.start()
+            run_request(client, counter, method, url, kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            for listener in listeners:
+                listener.get_received()
+            name = f'{method} {template}'
+            results[name] = summarize(samples, max(queries), peak, status)
+            print(f'  {name:62} {status} p50 {results[name]["p50_ms"]:9.2f} ms'
+                  f'  p95 {results[name]["p95_ms"]:9.2f} ms  {max(queries):3} queries'
+                  f'  {results[name]["peak_mb"]:8.2f} MB', flush=True)
+    finally:
+        counter.close()
+    return results
+
+
+def bench_socket_events(app, ctx, repeat):
+    samples = {name: [] for name in SOCKET_EVENTS}
+    # The handlers print on every event
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_socket_events(app, ctx, samples, repeat)
+    results = {}
+    for name in SOCKET_EVENTS:
+        results[f'socket {name}'] = summarize(samples[name])
+        print(f'  {"socket " + name:62}     p50 {results["socket " + name]["p50_ms"]:9.2f} ms')
+    return results
+
+
+def run_socket_events(app, ctx, samples, repeat):
+    for i in range(repeat):
+        started = time.perf_counter()
+        client = app.extensions['socketio'].test_client(app, auth={'user_id': ctx['user_id']})
+        samples['connect'].append(time.perf_counter() - started)
+        for name in ('join_project', 'leave_project'):
+            started = time.perf_counter()
+            client.emit(name, {'project_id': ctx['project_id']})
+            samples[name].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        client.disconnect()
+        samples['disconnect'].append(time.perf_counter() - started)
+
+
+def uncovered_endpoints(app):
+    adapter = app.url_map.bind('localhost')
+    covered = set()
+    for method, template, _ in REQUESTS:
+        path = template.split('?')[0].format(project_id=1, task_id=1)
+        covered.add((adapter.match(path, method=method)[0], method))
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if not rule.rule.startswith('/api/') or rule.endpoint in SKIPPED:
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            if (rule.endpoint, method) not in covered:
+                missing.append(f'{method} {rule.rule}')
+    return sorted(missing)
+
+
+def run_benchmarks(app, args):
+    # Requests run outside any app context of ours, so each one gets its own
+    # context and database session the way it would in production
+    with app.app_context():
+        engine = db.engine
+    socketio = app.extensions['socketio']
+    results = {
+        'meta': {
+            'date': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'database': engine.dialect.name,
+            'repeat': args.repeat,
+            'socket_clients': args.socket_clients,
+            'skipped': SKIPPED
+        },
+        'scales': {}
+    }
+    for scale in args.scales.split(','):
+        tasks = parse_scale(scale)
+        print(f'\n{scale}: generating {tasks} tasks', flush=True)
+        started = time.perf_counter()
+        with app.app_context():
+            counts = generate(tasks=tasks, progress=lambda line: print('  ' + line, flush=True))
+            generated = time.perf_counter() - started
+            ctx = dict(dataset_context(), run=scale)
+
+        client = app.test_client()
+        client.get('/api/users?limit=1')  # warm up the connection pool
+        with contextlib.redirect_stdout(io.StringIO()):
+            listeners = [socketio.test_client(app, auth={'user_id': ctx['user_id']})
+                         for _ in range(args.socket_clients)]
+            for listener in listeners:
+                listener.emit('join_project', {'project_id': ctx['project_id']})
+        try:
+            requests = bench_requests(client, engine, ctx, listeners, args)
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for listener in listeners:
+                    listener.disconnect()
+        requests.update(bench_socket_events(app, ctx, args.repeat))
+        results['scales'][scale] = {
+            'dataset': dict(counts, generate_seconds=round(generated, 1)),
+            'context': ctx,
+            'requests': requests
+        }
+    return results
+
+
+def compare(old_path, new_path, threshold=1.2):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    regressions = 0
+    for scale, data in new['scales'].items():
+        before = old['scales'].get(scale, {}).get('requests', {})
+        print(f'\n{scale}')
+        for name, result in data['requests'].items():
+            if name not in before:
+                print(f'  {name:62} new')
+                continue
+            ratio = result['p95_ms'] / before[name]['p95_ms'] if before[name]['p95_ms'] else 1.0
+            queries = result.get('queries', 0) - before[name].get('queries', 0)
+            flag = ''
+            if ratio > threshold or queries > 0:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f'  {name:62} p95 {before[name]["p95_ms"]:9.2f} -> {result["p95_ms"]:9.2f} ms'
+                  f' ({ratio:5.2f}x)  queries {queries:+d}{flag}')
+    return 1 if regressions else 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the API at several dataset sizes.')
+    parser.add_argument('--scales', default='10k,100k,1M')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-seconds', type=float, default=15.0,
+                        help='stop repeating a request after this long (at least 3 runs)')
+    parser.add_argument('--socket-clients', type=int, default=20)
+    parser.add_argument('--database', default='sqlite:////tmp/bench_api.db')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+    # The benchmark drops and regenerates every table, so it only ever runs
+    # against its own database
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+    missing = uncovered_endpoints(app)
+    for route in missing:
+        print(f'{route} is not benchmarked, add it to REQUESTS')
+    results = run_benchmarks(app, args)
+    results['meta']['not_benchmarked'] = missing
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\nwrote {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
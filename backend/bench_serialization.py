@@ -0,0 +1,108 @@
+"""Compare task list serialization paths on synthetic rows.
+
+    python bench_serialization.py [sizes...]      (default: 10000 100000)
+
+Times the original per-route dict comprehension + jsonify against the
+precompiled serializers with Flask's default provider, with the orjson
+provider and with the streamed chunked encoder. No database is involved:
+rows are built in memory so only serialization is measured.
+"""
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask.json.provider import DefaultJSONProvider
+
+from factory import create_app
+from routes import TASK_FIELDS
+from serializers import OrjsonProvider, iter_json_array, orjson, task_serializer
+
+Row = namedtuple('Row', TASK_FIELDS)
+
+
+def make_rows(count):
+    now = datetime.utcnow()
+    return [Row(
+        id=i,
+        title=f'Task {i}',
+        description='Implement backend logic and database.',
+        status=('todo', 'in_progress', 'completed')[i % 3],
+        priority=('low', 'medium', 'high', 'critical')[i % 4],
+        project_id=i % 200 + 1,
+        assignee_id=i % 50 + 1 if i % 7 else None,
+        assignee_name=f'User {i % 50 + 1}' if i % 7 else None,
+        due_date=now + timedelta(days=i % 30) if i % 5 else None,
+        created_at=now - timedelta(minutes=i),
+        comment_count=i % 9,
+        time_spent=i % 13 * 30
+    ) for i in range(1, count + 1)]
+
+
+def jsonify_comprehension(rows, provider):
+    # The shape get_tasks had before the serializer layer
+    return provider.response([{
+        'id': t.id,
+        'title': t.title,
+        'description': t.description,
+        'status': t.status,
+        'priority': t.priority,
+        'project_id': t.project_id,
+        'assignee_id': t.assignee_id,
+        'assignee_name': t.assignee_name,
+        'due_date': t.due_date.isoformat() if t.due_date else None,
+        'created_at': t.created_at.isoformat(),
+        'comment_count': t.comment_count,
+        'time_spent': t.time_spent
+    } for t in rows]).get_data()
+
+
+def serializer_response(rows, provider):
+    return provider.response(task_serializer(TASK_FIELDS).many(rows)).get_data()
+
+
+def serializer_stream(rows, provider):
+    serialize = task_serializer(TASK_FIELDS)
+    return ''.join(iter_json_array(map(serialize, rows), provider.dumps)).encode()
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+
+def main(argv):
+    sizes = [int(a) for a in argv] or [10000, 100000]
+    app = create_app()
+    default = DefaultJSONProvider(app)
+    cases = [
+        ('dict comprehension + jsonify', jsonify_comprehension, default),
+        ('serializer + default provider', serializer_response, default),
+    ]
+    if orjson is not None:
+        fast = OrjsonProvider(app)
+        cases += [
+            ('serializer + orjson provider', serializer_response, fast),
+            ('serializer + orjson streamed', serializer_stream, fast),
+        ]
+    else:
+        print('orjson is not installed, skipping the orjson cases')
+
+    with app.test_request_context():
+        for size in sizes:
+            rows = make_rows(size)
+            baseline = None
+            print(f'\n{size} tasks')
+            for name, func, provider in cases:
+                seconds, length = best_of(lambda: func(rows, provider))
+                baseline = baseline or seconds
+                print(f'  {name:32} {seconds * 1000:9.1f} ms  {length / 1e6:6.2f} MB  '
+                      f'{baseline / seconds:5.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
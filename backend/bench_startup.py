@@ -0,0 +1,73 @@
+"""Measure the cold start of a freshly spawned worker.
+
+    python bench_startup.py [--runs 10] [--database sqlite:////tmp/bench_startup.db]
+                            [--init-on-startup]
+
+Each run starts a new Python process that imports app.py and serves one
+request, then a second one, through Flask's test client. Reported per run:
+the time from spawning the process until the app is imported, the first
+and second request latency, and the total until the first response. The
+database is migrated and seeded once beforehand, the way a deploy runs
+``flask --app app init-db``; --init-on-startup sets INIT_DB_ON_STARTUP=1 in
+the workers instead to include that step.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+WORKER = '''
+import json, os, sys, time
+spawned = float(os.environ['BENCH_SPAWNED_AT'])
+from app import app
+imported = time.time()
+client = app.test_client()
+started = time.perf_counter()
+first = client.get('/api/users?limit=1')
+first_ms = (time.perf_counter() - started) * 1000
+started = time.perf_counter()
+client.get('/api/users?limit=1')
+second_ms = (time.perf_counter() - started) * 1000
+assert first.status_code == 200, first.status_code
+json.dump({'import_ms': (imported - spawned) * 1000, 'first_request_ms': first_ms,
+           'second_request_ms': second_ms,
+           'ready_ms': (imported - spawned) * 1000 + first_ms}, sys.stdout)
+'''
+
+
+def spawn(env):
+    env = dict(env, BENCH_SPAWNED_AT=repr(time.time()))
+    result = subprocess.run([sys.executable, '-c', WORKER], env=env, capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measure worker cold start time.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database', default='sqlite:////tmp/bench_startup.db')
+    parser.add_argument('--init-on-startup', action='store_true')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, DATABASE_URL=args.database)
+    env.pop('INIT_DB_ON_STARTUP', None)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], env=env,
+                   cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+                   stdout=subprocess.DEVNULL)
+    if args.init_on_startup:
+        env['INIT_DB_ON_STARTUP'] = '1'
+
+    runs = [spawn(env) for _ in range(args.runs)]
+    print(f'{args.runs} cold starts on {args.database}')
+    for key in ('import_ms', 'first_request_ms', 'second_request_ms', 'ready_ms'):
+        values = [run[key] for run in runs]
+        print(f'{key:18} median {statistics.median(values):8.1f}  min {min(values):8.1f}'
+              f'  max {max(values):8.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,200 @@
+"""Response cache for read-heavy endpoints.
+
+A cached response is keyed by its endpoint, query string and the user it was
+served to, plus the write generation of every table it was built from. A
+commit that wrote to a table bumps that table's generation, so the next
+request misses and rebuilds the response. Written tables are picked up from
+the session, both flushed objects and the INSERT/UPDATE/DELETE statements run
+through it, so every write path invalidates without knowing about the cache.
+
+Generations are read before the database is, so a response built while a
+write commits is stored under the old generation and never served again.
+
+Backends are pluggable (CACHE_BACKENDS): memory is an LRU per process, redis
+shares entries and generations between processes. Writes the app does not
+see, such as generate_data.py or another process on the memory backend, show
+up when entries expire after CACHE_TTL_SECONDS.
+"""
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from models import db
+
+# Headers the views set; CORS and the other after_request headers are added
+# again to a cached response
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'X-Next-Cursor')
+
+
+class MemoryCache:
+    """Least recently used entries with a TTL, in this process."""
+
+    def __init__(self, app):
+        self.max_entries = app.config['CACHE_MAX_ENTRIES']
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Kept apart from the entries so eviction never resets a generation
+        # and brings an older entry back
+        self._generations = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, tables):
+        with self._lock:
+            return [self._generations.get(table, 0) for table in tables]
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+
+class RedisCache:
+    """Entries and generations in Redis at CACHE_URL, shared by every
+    process; entries expire through Redis TTLs and its eviction policy."""
+
+    def __init__(self, app):
+        # Only deployments that pick this backend need the redis package
+        import redis
+
+        self.client = redis.Redis.from_url(app.config['CACHE_URL'])
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def generations(self, tables):
+        return [int(value or 0) for value in self.client.mget([f'generation:{t}' for t in tables])]
+
+    def bump(self, tables):
+        pipeline = self.client.pipeline(transaction=False)
+        for table in tables:
+            pipeline.incr(f'generation:{table}')
+        pipeline.execute()
+
+
+CACHE_BACKENDS = {
+    'memory': MemoryCache,
+    'redis': RedisCache
+}
+
+
+class ResponseCache:
+    """An app's cache backend and its hit/miss counters."""
+
+    def __init__(self, app, backend, registry):
+        self.ttl = app.config['CACHE_TTL_SECONDS']
+        self.backend = backend
+        self.lookups = registry.counter(
+            'cache_requests_total', 'Cached endpoint requests, by hit or miss.', ('endpoint', 'result'))
+        self.invalidations = registry.counter(
+            'cache_invalidations_total', 'Commits that invalidated cached responses, per table.', ('table',))
+
+    def key(self, tables, scope):
+        generations = self.backend.generations(tables)
+        raw = repr((request.endpoint, sorted(request.args.items(multi=True)), scope, generations))
+        return 'response:' + hashlib.sha1(raw.encode()).hexdigest()
+
+    def serve(self, tables, view, args, kwargs):
+        if self.ttl <= 0:
+            return view(*args, **kwargs)
+        key = self.key(tables, request_scope())
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.lookups.inc(endpoint=request.endpoint, result='hit')
+            response = current_app.response_class(cached['body'], status=cached['status'],
+                                                  headers=cached['headers'])
+            return response.make_conditional(request)
+        self.lookups.inc(endpoint=request.endpoint, result='miss')
+        response = current_app.make_response(view(*args, **kwargs))
+        # Streamed lists are left out to keep entries small; a 304 has no
+        # body to store
+        if response.status_code == 200 and not response.is_streamed:
+            self.backend.set(key, {
+                'status': response.status_code,
+                'headers': [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers],
+                'body': response.get_data(as_text=True)
+            }, self.ttl)
+        return response
+
+    def invalidate(self, tables):
+        self.backend.bump(sorted(tables))
+        for table in tables:
+            self.invalidations.inc(table=table)
+
+
+def init_cache(app, registry):
+    backend = CACHE_BACKENDS[app.config['CACHE_BACKEND']](app)
+    app.extensions['cache'] = ResponseCache(app, backend, registry)
+
+
+def request_scope():
+    return 1 # Dummy user for now
+
+
+def cached(*tables):
+    """Serve the view from the response cache until one of ``tables`` is
+    written. Only GET views whose response depends on nothing but the query
+    string, the user and those tables can be cached."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return current_app.extensions['cache'].serve(tables, view, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def written_tables(session):
+    return session.info.setdefault('written_tables', set())
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_flushed_tables(session, flush_context):
+    written_tables(session).update(
+        obj.__tablename__ for obj in list(session.new) + list(session.dirty) + list(session.deleted))
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def note_statement_table(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        written_tables(state.session).add(state.statement.table.name)
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_written_tables(session):
+    tables = session.info.pop('written_tables', None)
+    cache = current_app.extensions.get('cache')
+    if tables and cache is not None:
+        cache.invalidate(tables)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def forget_written_tables(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('written_tables', None)
@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+
+
+class EventCoalescer:
+    """Buffer per-room updates for ``window`` seconds and hand each room's
+    buffer to ``flush`` as one batch.
+
+    Updates with the same key inside a window are merged: the latest payload
+    wins but keeps the position of the key's first update, so a batch lists
+    every key once, in first-touched order. Batches for a room are numbered
+    with a per-room sequence and flushed one at a time, so they reach
+    ``flush`` in the order they were opened.
+
+    ``start_task`` and ``sleep`` are SocketIO's ``start_background_task`` and
+    ``sleep`` so the timers cooperate with whichever async mode is in use.
+    """
+
+    def __init__(self, window, flush, start_task, sleep):
+        self.window = window
+        self._flush = flush
+        self._start_task = start_task
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._sequence = {}
+
+    def add(self, room, key, payload):
+        with self._lock:
+            batch = self._pending.get(room)
+            if batch is None:
+                batch = self._pending[room] = OrderedDict()
+                self._start_task(self._flush_later, room)
+            batch[key] = payload
+
+    def _flush_later(self, room):
+        self._sleep(self.window)
+        self.flush(room)
+
+    def flush(self, room=None):
+        """Send the pending batch for ``room`` (every room when None) now."""
+        with self._flush_lock:
+            with self._lock:
+                rooms = [room] if room is not None else list(self._pending)
+                batches = []
+                for r in rooms:
+                    batch = self._pending.pop(r, None)
+                    if batch:
+                        self._sequence[r] = self._sequence.get(r, 0) + 1
+                        batches.append((r, self._sequence[r], list(batch.values())))
+            for r, sequence, payloads in batches:
+                self._flush(r, sequence, payloads)
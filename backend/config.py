@@ -0,0 +1,59 @@
+import secrets
+
+
+def load_config(env):
+    """App settings read from ``env``, normally ``os.environ``."""
+    return {
+        # Nothing signed with the key outlives a worker yet, so a random key
+        # per process is a safe default; set SECRET_KEY once sessions are used
+        'SECRET_KEY': env.get('SECRET_KEY') or secrets.token_hex(32),
+        'SQLALCHEMY_DATABASE_URI': env.get('DATABASE_URL', 'sqlite:///task_management.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # development keeps SQLAlchemy's defaults; production sizes the
+        # connection pool and runs SQLite in WAL mode with a busy timeout. With
+        # a replica URL set, GET requests read from it
+        'DATABASE_PROFILE': env.get('DATABASE_PROFILE', 'development'),
+        'DATABASE_REPLICA_URL': env.get('DATABASE_REPLICA_URL'),
+        # Requests do no setup work. Deploys with a throwaway database, like
+        # the /tmp SQLite file on serverless hosts, set INIT_DB_ON_STARTUP=1 to
+        # migrate and seed once when the app is created
+        'INIT_DB_ON_STARTUP': env.get('INIT_DB_ON_STARTUP') == '1',
+        # Cross-process event delivery, e.g. redis://localhost:6379/0 when
+        # running several workers; loopback:// keeps the queue in-process for
+        # tests
+        'SOCKETIO_MESSAGE_QUEUE': env.get('SOCKETIO_MESSAGE_QUEUE'),
+        'SOCKETIO_CHANNEL': env.get('SOCKETIO_CHANNEL', 'socketio'),
+        'SOCKETIO_ASYNC_MODE': env.get('SOCKETIO_ASYNC_MODE'),
+        # task_updated events for the same room inside this window go out as
+        # one tasks_updated batch; 0 sends every update on its own
+        'TASK_UPDATE_COALESCE_MS': int(env.get('TASK_UPDATE_COALESCE_MS', 50)),
+        # Side effects of writes run as background jobs (jobs.py), kept in the
+        # database by default or in process memory with JOB_STORE=memory. Each
+        # web process runs JOB_WORKERS threads; JOB_WORKERS=0 leaves the jobs
+        # to `flask --app app work-jobs`. Failed jobs are retried after
+        # JOB_RETRY_SECONDS, doubling each time, up to JOB_MAX_ATTEMPTS runs
+        'JOB_STORE': env.get('JOB_STORE', 'database'),
+        'JOB_WORKERS': int(env.get('JOB_WORKERS', 1)),
+        'JOB_MAX_ATTEMPTS': int(env.get('JOB_MAX_ATTEMPTS', 5)),
+        'JOB_RETRY_SECONDS': float(env.get('JOB_RETRY_SECONDS', 2)),
+        'JOB_POLL_SECONDS': float(env.get('JOB_POLL_SECONDS', 5)),
+        # GET /api/users and /api/projects are served from a response cache
+        # until a commit writes to the tables behind them. The memory backend
+        # is per process, so with several processes other writers' changes
+        # show up after CACHE_TTL_SECONDS; CACHE_BACKEND=redis with CACHE_URL
+        # shares it. CACHE_TTL_SECONDS=0 turns caching off
+        'CACHE_BACKEND': env.get('CACHE_BACKEND', 'memory'),
+        'CACHE_URL': env.get('CACHE_URL'),
+        'CACHE_TTL_SECONDS': float(env.get('CACHE_TTL_SECONDS', 30)),
+        'CACHE_MAX_ENTRIES': int(env.get('CACHE_MAX_ENTRIES', 1000)),
+        # orjson encodes responses when it is installed; set
+        # JSON_PROVIDER=default to use Flask's standard library provider
+        'JSON_PROVIDER': env.get('JSON_PROVIDER', 'orjson'),
+        # REQUEST_PROFILING=1 lets a request ask for a cProfile run with an
+        # X-Profile header; profiles of requests slower than PROFILE_SLOW_MS
+        # are logged, and saved as .prof files when PROFILE_DIR is set
+        'REQUEST_PROFILING': env.get('REQUEST_PROFILING') == '1',
+        'PROFILE_SLOW_MS': int(env.get('PROFILE_SLOW_MS', 0)),
+        'PROFILE_DIR': env.get('PROFILE_DIR')
+    }
+
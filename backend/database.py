@@ -0,0 +1,114 @@
+import sqlite3
+
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import CompoundSelect, Select
+
+REPLICA_BIND = 'replica'
+
+# Per-connection settings for SQLite in the production profile. WAL lets
+# readers and one writer work at the same time instead of locking the whole
+# file; busy_timeout makes a second writer wait for the lock instead of
+# failing with "database is locked"
+PRODUCTION_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 10000
+}
+
+
+def in_memory(url):
+    return url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:')
+
+
+def pool_options(url, env):
+    """Pool settings for the production profile, overridable from ``env``.
+    In-memory SQLite keeps its single shared connection."""
+    if in_memory(url):
+        return {}
+    return {
+        'pool_size': int(env.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(env.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(env.get('DB_POOL_TIMEOUT', 30)),
+        # Reconnect before servers or proxies drop idle connections, and
+        # test each connection on checkout so a dropped one is replaced
+        # instead of failing the request
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
+
+def database_options(config, env):
+    """Flask-SQLAlchemy settings for ``DATABASE_PROFILE`` and the optional
+    ``DATABASE_REPLICA_URL`` in ``config``. The development profile keeps
+    SQLAlchemy's defaults."""
+    url = config['SQLALCHEMY_DATABASE_URI']
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    production = config.get('DATABASE_PROFILE') == 'production'
+    options = {
+        'SQLALCHEMY_ENGINE_OPTIONS': pool_options(url, env) if production else {},
+        'SQLITE_PRAGMAS': dict(PRODUCTION_SQLITE_PRAGMAS) if production else {},
+        'SQLALCHEMY_BINDS': {}
+    }
+    if replica_url:
+        replica = {'url': replica_url}
+        if production:
+            replica.update(pool_options(replica_url, env))
+        options['SQLALCHEMY_BINDS'] = {REPLICA_BIND: replica}
+    return options
+
+
+def install_sqlite_pragmas(engines, pragmas):
+    """Run ``PRAGMA name = value`` for ``pragmas`` on every new SQLite
+    connection of ``engines``."""
+    if not pragmas:
+        return
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    for engine in engines:
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+
+
+def begin_write(session):
+    """Make the session's transaction hold SQLite's write lock from now on,
+    so rows it reads cannot change before it commits. SQLite ignores
+    SELECT ... FOR UPDATE and otherwise only locks at the first write; other
+    databases are left alone and the caller locks its rows FOR UPDATE."""
+    connection = session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+    dbapi_connection = connection.connection.dbapi_connection
+    # Already writing means the lock is already held
+    if not dbapi_connection.in_transaction:
+        dbapi_connection.execute('BEGIN IMMEDIATE')
+
+
+def route_reads_to_replica():
+    """before_request hook sending the reads of GET requests to the replica."""
+    if request.method in ('GET', 'HEAD'):
+        g.read_replica = True
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to the replica bind while ``g.read_replica``
+    is set.
+
+    Flushes, INSERT/UPDATE/DELETE, text statements and bare ``connection()``
+    calls always use the primary, so a request routed to the replica still
+    writes to the primary. Reads on the replica can lag the primary by the
+    replication delay.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, (Select, CompoundSelect))
+                and has_app_context() and g.get('read_replica')):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,71 @@
+import os
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from flask_cors import CORS
+
+from cache import init_cache
+from config import load_config
+from database import database_options, install_sqlite_pragmas, route_reads_to_replica
+from jobs import init_jobs, work_jobs_command
+from migrations import migrate
+from models import User, db
+from monitoring import init_monitoring
+from routes import TASK_JOBS, api
+from sample_data import create_sample_data
+from serializers import OrjsonProvider, orjson
+from sockets import init_realtime
+
+
+def create_app(config=None):
+    """Build the Flask app from the environment, with ``config`` taking
+    precedence. Every app gets its own engines, Socket.IO server, job queue,
+    response cache and metrics, so several can run side by side in one
+    process."""
+    app = Flask(__name__, instance_path='/tmp')
+    app.config.update(load_config(os.environ))
+    app.config.update(config or {})
+    for key, value in database_options(app.config, os.environ).items():
+        app.config.setdefault(key, value)
+
+    if app.config['JSON_PROVIDER'] == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+    db.init_app(app)
+    with app.app_context():
+        engines = list(db.engines.values())
+    install_sqlite_pragmas(engines, app.config['SQLITE_PRAGMAS'])
+    CORS(app, expose_headers=['X-Next-Cursor'])
+    init_monitoring(app, engines)
+    init_cache(app, app.extensions['metrics'])
+    init_realtime(app, app.extensions['metrics'])
+    init_jobs(app, app.extensions['metrics'], TASK_JOBS,
+              app.extensions['realtime'].socketio.start_background_task)
+    if app.config['DATABASE_REPLICA_URL']:
+        app.before_request(route_reads_to_replica)
+    app.register_blueprint(api)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(work_jobs_command)
+
+    if app.config['INIT_DB_ON_STARTUP']:
+        initialize_database(app)
+    return app
+
+
+def initialize_database(app, seed=True):
+    """Apply pending migrations and, with ``seed``, add the demo data to an
+    empty database. Run once per deploy with ``flask --app app init-db``."""
+    with app.app_context():
+        migrate(db.engine, db.metadata)
+        if seed and not User.query.first():
+            print('Seeding sample data...')
+            create_sample_data()
+
+
+@click.command('init-db')
+@click.option('--seed/--no-seed', default=True, help='Add the demo data to an empty database.')
+@with_appcontext
+def init_db_command(seed):
+    """Migrate the database schema to the latest version."""
+    initialize_database(current_app, seed)
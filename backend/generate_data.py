@@ -0,0 +1,208 @@
+"""Generate a large synthetic dataset with skewed distributions.
+
+    python generate_data.py [--tasks 100000] [--users N] [--projects N]
+                            [--comments-per-task 2] [--time-entries-per-task 1.5]
+                            [--skew 1.1] [--seed 42] --force
+
+Drops and recreates every table in DATABASE_URL at the latest schema
+version, so it refuses to run without --force. Task counts per project
+and assignments per user follow a Zipf-like distribution (a few hot
+projects and busy users, a long tail of quiet ones); comments and time
+entries per task are exponential around their means. Rows go in through
+Core executemany in chunks, then the search index, the task counters and
+the change log are filled in with one INSERT ... SELECT each, the
+analytics rollups from one aggregate query each and the Kanban ranks in
+id order per column. User 1 is an admin.
+"""
+import argparse
+import bisect
+import itertools
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect
+
+from factory import create_app
+from migrations import create_schema, version_metadata
+from models import (TASK_PRIORITIES, TASK_STATUSES, ChangeLog, Project, ProjectMember, Task,
+                    TaskComment, TimeEntry, User, db, rebuild_task_counts, record_reset)
+from ranks import rebuild_ranks
+from rollups import rebuild_rollups
+from search import refresh_search_index
+
+CHUNK_SIZE = 10000
+WORDS = ('api', 'billing', 'cache', 'dashboard', 'deploy', 'docs', 'export', 'login',
+         'mobile', 'onboarding', 'payments', 'reports', 'search', 'security', 'sync')
+
+
+def zipf_picker(rng, count, skew):
+    """Return a function drawing 1..count with weight 1/rank**skew."""
+    cumulative = list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+    total = cumulative[-1]
+    return lambda: bisect.bisect_left(cumulative, rng.random() * total) + 1
+
+
+def insert_chunks(table, rows):
+    count = 0
+    for chunk in iter(lambda: list(itertools.islice(rows, CHUNK_SIZE)), []):
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+
+def generate(tasks=100000, users=None, projects=None, comments_per_task=2.0,
+             time_entries_per_task=1.5, skew=1.1, seed=42, progress=print):
+    """Fill the database and return the number of rows per table."""
+    rng = random.Random(seed)
+    users = users or max(5, tasks // 200)
+    projects = projects or max(1, tasks // 100)
+    now = datetime.utcnow()
+    year = 365 * 24 * 3600
+
+    def past(max_seconds=year):
+        return now - timedelta(seconds=rng.randrange(max_seconds))
+
+    # The new log starts after the old one with a reset marker, so clients
+    # synced against the old data reload
+    with db.engine.connect() as connection:
+        last_change = connection.execute(db.select(db.func.max(ChangeLog.id))).scalar() \
+            if inspect(connection).has_table('change_log') else None
+    db.drop_all()
+    with db.engine.begin() as connection:
+        version_metadata.drop_all(connection)
+        create_schema(connection, db.metadata)
+        record_reset(connection, after=last_change or 0)
+    counts = {}
+
+    def step(name, table, rows):
+        started = time.perf_counter()
+        counts[name] = insert_chunks(table, rows)
+        progress(f'{name:14} {counts[name]:>10} rows  {time.perf_counter() - started:6.1f}s')
+
+    step('users', User.__table__, ({
+        'name': f'User {i}',
+        'email': f'user{i}@example.com',
+        'password': 'password123',
+        'role': 'admin' if i == 1 else 'user',
+        'created_at': past()
+    } for i in range(1, users + 1)))
+
+    pick_user = zipf_picker(rng, users, skew)
+    owners = [pick_user() for _ in range(projects)]
+    step('projects', Project.__table__, ({
+        'name': f'Project {i} {rng.choice(WORDS)}',
+        'description': f'Synthetic project {i}',
+        'status': rng.choice(('active', 'active', 'active', 'planning', 'completed')),
+        'owner_id': owners[i - 1],
+        'created_at': past()
+    } for i in range(1, projects + 1)))
+
+    def members():
+        for project_id, owner_id in enumerate(owners, 1):
+            team = {owner_id} | {pick_user() for _ in range(rng.randint(2, 8))}
+            for user_id in team:
+                yield {'project_id': project_id, 'user_id': user_id,
+                       'role': 'owner' if user_id == owner_id else 'member', 'joined_at': past()}
+    step('members', ProjectMember.__table__, members())
+
+    pick_project = zipf_picker(rng, projects, skew)
+
+    def task_rows():
+        for i in range(1, tasks + 1):
+            created_at = past()
+            project_id = pick_project()
+            yield {
+                'title': f'{rng.choice(WORDS).title()} task {i}',
+                'description': f'Work on {rng.choice(WORDS)} for project {project_id}.',
+                'status': rng.choice(TASK_STATUSES),
+                'priority': rng.choice(TASK_PRIORITIES),
+                'project_id': project_id,
+                'assignee_id': pick_user() if rng.random() < 0.9 else None,
+                'created_by': owners[project_id - 1],
+                'due_date': created_at + timedelta(days=rng.randint(1, 90)) if rng.random() < 0.7 else None,
+                'created_at': created_at,
+                'updated_at': created_at + timedelta(seconds=rng.randrange(30 * 24 * 3600))
+            }
+    step('tasks', Task.__table__, task_rows())
+
+    def per_task(mean):
+        for task_id in range(1, tasks + 1):
+            for _ in range(round(rng.expovariate(1 / mean)) if mean else 0):
+                yield task_id
+
+    step('comments', TaskComment.__table__, ({
+        'task_id': task_id,
+        'user_id': pick_user(),
+        'content': f'Update on {rng.choice(WORDS)}.',
+        'created_at': past()
+    } for task_id in per_task(comments_per_task)))
+
+    def time_entries():
+        for task_id in per_task(time_entries_per_task):
+            start = past()
+            duration = rng.randint(15, 480)
+            yield {'task_id': task_id, 'user_id': pick_user(), 'description': 'Worked on it',
+                   'start_time': start, 'end_time': start + timedelta(minutes=duration),
+                   'duration': duration, 'created_at': start}
+    step('time_entries', TimeEntry.__table__, time_entries())
+
+    started = time.perf_counter()
+    refresh_search_index(db.session.connection())
+    db.session.commit()
+    progress(f'{"search index":14} {counts["tasks"]:>10} rows  {time.perf_counter() - started:6.1f}s')
+
+    started = time.perf_counter()
+    rebuild_rollups(db.session.connection())
+    db.session.commit()
+    progress(f'{"rollups":14} {counts["time_entries"]:>10} rows  {time.perf_counter() - started:6.1f}s')
+
+    started = time.perf_counter()
+    rebuild_ranks(db.session.connection())
+    db.session.commit()
+    progress(f'{"ranks":14} {counts["tasks"]:>10} rows  {time.perf_counter() - started:6.1f}s')
+
+    rebuild_task_counts()
+    log = ChangeLog.__table__
+    for model in (Project, ProjectMember, Task, TaskComment, TimeEntry):
+        db.session.execute(log.insert().from_select(
+            ['entity', 'entity_id', 'operation', 'changed_at'],
+            db.select(db.literal(model.__tablename__), model.id, db.literal('upsert'), db.literal(now))
+              .order_by(model.id)
+        ))
+    db.session.commit()
+    # Give the query planner statistics for the new data
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+    return counts
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Generate a synthetic dataset.')
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--users', type=int, help='default: tasks / 200')
+    parser.add_argument('--projects', type=int, help='default: tasks / 100')
+    parser.add_argument('--comments-per-task', type=float, default=2.0)
+    parser.add_argument('--time-entries-per-task', type=float, default=1.5)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent, 0 for uniform')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='drop every table in DATABASE_URL')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    if not args.force:
+        print(f'This drops every table in {app.config["SQLALCHEMY_DATABASE_URI"]}; '
+              'run again with --force to go ahead', file=sys.stderr)
+        return 1
+    with app.app_context():
+        started = time.perf_counter()
+        generate(args.tasks, args.users, args.projects, args.comments_per_task,
+                 args.time_entries_per_task, args.skew, args.seed)
+        print(f'done in {time.perf_counter() - started:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
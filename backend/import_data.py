@@ -0,0 +1,56 @@
+"""Bulk import users, tasks or time entries from CSV or NDJSON.
+
+    python import_data.py <users|tasks|time_entries> <file> [--format csv|ndjson]
+                          [--chunk-size N]
+
+The file is read line by line and written in one transaction per chunk, so
+it can be far larger than memory. Tasks refer to their project by
+``project_id`` or ``project`` (name) and to users by ``assignee_id`` /
+``assignee`` (email) and ``created_by`` / ``creator``; time entries by
+``task_id`` and ``user_id`` / ``user``. Rejected rows are listed at the end.
+"""
+import argparse
+import sys
+import time
+
+from factory import create_app, initialize_database
+from importer import IMPORT_FORMATS, read_records
+from routes import IMPORT_CHUNK_SIZE, IMPORT_ENTITIES, import_records
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Bulk import CSV or NDJSON data.')
+    parser.add_argument('entity', choices=sorted(IMPORT_ENTITIES))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=IMPORT_FORMATS)
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    fmt = args.format or args.path.rsplit('.', 1)[-1].lower()
+    if fmt not in IMPORT_FORMATS:
+        parser.error('cannot tell the format from the file name, pass --format')
+
+    app = create_app()
+    initialize_database(app, seed=False)
+    last_report = 0
+
+    def progress(stats):
+        nonlocal last_report
+        if time.perf_counter() - last_report >= 1:
+            last_report = time.perf_counter()
+            print(f'{stats.read:>10} read {stats.imported:>10} imported {stats.rejected:>8} rejected'
+                  f'  {stats.rows_per_second:>8.0f} rows/s', flush=True)
+
+    with app.app_context(), open(args.path, encoding='utf-8-sig', newline='') as stream:
+        stats = import_records(args.entity, read_records(stream, fmt), args.chunk_size, progress)
+
+    for error in stats.errors:
+        print(f"line {error['line']}: {error['error']}")
+    if stats.rejected > len(stats.errors):
+        print(f'... {stats.rejected - len(stats.errors)} more rejected rows')
+    print(f'{stats.imported} of {stats.read} rows imported in {stats.elapsed:.1f}s '
+          f'({stats.rows_per_second:.0f} rows/s)')
+    return 1 if stats.rejected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,100 @@
+import csv
+import json
+import time
+from itertools import islice
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+def read_records(stream, fmt):
+    """Yield ``(line number, record dict)`` from a text stream of CSV (with a
+    header row) or NDJSON, one line at a time. A malformed NDJSON line is
+    yielded as a ValueError in place of the dict."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('expected an object')
+        except ValueError as e:
+            record = ValueError(f'invalid JSON: {e}')
+        yield line_number, record
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImportStats:
+    """Running totals of an import, handed to the progress callback after
+    every chunk. Only the first ``max_errors`` rejections are kept."""
+
+    def __init__(self, max_errors=100):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self):
+        return {
+            'read': self.read,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second)
+        }
+
+
+def run_import(records, validate, write, chunk_size=5000, progress=None, max_errors=100):
+    """Validate and write ``records`` chunk by chunk.
+
+    ``validate(chunk)`` gets a list of ``(line, record)`` pairs and returns
+    the column values to insert plus ``(line, message)`` rejections;
+    ``write(rows)`` inserts one chunk in its own transaction. Only one chunk
+    is in memory at a time, whatever the size of the input.
+    """
+    stats = ImportStats(max_errors)
+    for chunk in chunked(records, chunk_size):
+        stats.read += len(chunk)
+        parsed, unparsed = [], []
+        for line, record in chunk:
+            if isinstance(record, ValueError):
+                unparsed.append((line, str(record)))
+            else:
+                parsed.append((line, record))
+        rows, rejected = validate(parsed)
+        for line, message in sorted(unparsed + rejected):
+            stats.reject(line, message)
+        if rows:
+            write(rows)
+            stats.imported += len(rows)
+        if progress:
+            progress(stats)
+    return stats
@@ -0,0 +1,143 @@
+"""Replay the API's read queries through EXPLAIN and report full table scans.
+
+    python index_advisor.py [--fail-on-scan]
+
+Every SELECT issued while serving REPLAY_REQUESTS is captured from the
+engine and explained against the database in DATABASE_URL, so the same
+check runs on SQLite and Postgres. GET routes missing from REPLAY_REQUESTS
+are reported too, so new endpoints get added here instead of slipping by.
+"""
+import json
+import re
+import sys
+
+from sqlalchemy import event
+
+from app import app
+from factory import initialize_database
+from models import db
+
+# (url, tables a full scan is expected on). Unfiltered listings walk the
+# table or the ordering index and stop at LIMIT, which is what we want, and
+# their validators sum the per-project counters, one row per project/status.
+REPLAY_REQUESTS = [
+    ('/api/tasks?limit=50', {'task', 'project_task_count'}),
+    ('/api/tasks?project_id=1', set()),
+    ('/api/tasks?project_id=1&status=todo', set()),
+    ('/api/tasks?project_id=1&status=todo&order_by=rank', set()),
+    ('/api/tasks?assignee_id=2', set()),
+    ('/api/tasks?limit=50&order_by=updated_at', {'task', 'project_task_count'}),
+    ('/api/projects?limit=50', {'project', 'project_task_count'}),
+    ('/api/projects/1', set()),
+    ('/api/users?limit=50', {'user'}),
+    ('/api/realtime/stats', set()),
+    # Counting jobs by status walks the status index; the table only holds
+    # pending jobs and dead letters
+    ('/api/jobs', {'job'}),
+    ('/api/metrics', set()),
+    ('/api/sync?since=0', set()),
+    ('/api/search?q=design', set()),
+    ('/api/search?q=dev&project_id=1&status=todo', set()),
+    ('/api/analytics/time?period=week', set()),
+    ('/api/analytics/time?period=month&project_id=1&group_by=user', set()),
+    ('/api/analytics/time?period=day&user_id=2&group_by=project', set()),
+    ('/api/analytics/time?task_id=1&group_by=user', set()),
+    ('/api/analytics/burndown?project_id=1', set()),
+    ('/api/analytics/velocity', set()),
+    ('/api/export/tasks?project_id=1', set()),
+    ('/api/export/time_entries?from=2024-01-01&to=2024-02-01', set()),
+    # The demo user is an admin, whose stats cover every project: that reads
+    # the project table and the per-project counters, never the tasks
+    ('/api/dashboard/stats', {'project', 'project_task_count'}),
+]
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+def explain_sqlite(conn, statement, parameters):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    scans = []
+    for row in rows:
+        # "SCAN task" and "SCAN task USING [COVERING] INDEX ..." both read
+        # every row; only "SEARCH ..." lines are bounded by an index lookup.
+        # Scans of materialized subqueries are not tables and are skipped.
+        match = SQLITE_SCAN.match(row[-1])
+        if match and match.group(1) in db.metadata.tables:
+            scans.append(match.group(1))
+    return scans
+
+
+def explain_postgres(conn, statement, parameters):
+    # With sequential scans priced out, any Seq Scan left in the plan has no
+    # usable index behind it, whatever the current table sizes are
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def capture_statements(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        # Buffered so streamed bodies, and the queries behind them, are
+        # read while the listener is attached
+        response = client.get(url, buffered=True)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response.status_code, statements
+
+
+def uncovered_routes():
+    replayed = {url.split('?')[0] for url, _ in REPLAY_REQUESTS}
+    patterns = [re.sub(r'<(?:\w+:)?\w+>', '1', rule.rule) for rule in app.url_map.iter_rules()
+                if 'GET' in rule.methods and rule.rule.startswith('/api/')]
+    return sorted(p for p in patterns if p not in replayed)
+
+
+def main(argv):
+    fail_on_scan = '--fail-on-scan' in argv
+    initialize_database(app)
+    client = app.test_client()
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        explain = explain_postgres if dialect == 'postgresql' else explain_sqlite
+        print(f'Explaining queries on {dialect}')
+
+        problems = 0
+        for url, expected in REPLAY_REQUESTS:
+            status, statements = capture_statements(client, url)
+            scans = set()
+            with db.engine.begin() as conn:
+                for statement, parameters in statements:
+                    scans.update(explain(conn, statement, parameters))
+            unexpected = sorted(scans - expected)
+            problems += len(unexpected)
+            verdict = 'FULL SCAN on ' + ', '.join(unexpected) if unexpected else 'ok'
+            print(f'{url:45} {status} {len(statements):3} queries  {verdict}')
+
+    missing = uncovered_routes()
+    for route in missing:
+        print(f'{route:45} not replayed, add it to REPLAY_REQUESTS')
+
+    if fail_on_scan and (problems or missing):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
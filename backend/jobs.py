@@ -0,0 +1,318 @@
+"""Background jobs for the side effects of writes.
+
+A request handler enqueues jobs and commits; workers run them afterwards,
+so side effects add nothing to the request's latency. Jobs are released
+only when the write they belong to commits and dropped if it rolls back.
+A failing job is retried with exponential backoff and, after JOB_MAX_ATTEMPTS
+runs, kept as a dead letter until it is retried by hand.
+
+Stores are pluggable (JOB_STORES). The database store keeps jobs in the
+job table of the app database, inserted in the writing transaction, and
+survives restarts; the memory store keeps them in the process.
+"""
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, or_, select
+
+from models import Job, db
+
+QUEUED = 'queued'
+DEAD = 'dead'
+CLAIM_BATCH_SIZE = 10
+# A claimed job whose worker died is run again once its lease runs out
+LEASE_SECONDS = 300
+MAX_RETRY_SECONDS = 600
+
+ClaimedJob = namedtuple('ClaimedJob', 'id name payload attempts')
+
+
+class DatabaseJobStore:
+    """Jobs as rows of the job table. Workers claim due rows by leasing
+    them, so several processes can share the table."""
+
+    def __init__(self, app):
+        with app.app_context():
+            self.engine = db.engine
+        self.table = Job.__table__
+
+    def add(self, session, jobs):
+        session.execute(self.table.insert(), jobs)
+
+    def committed(self, session):
+        pass
+
+    def discard(self, session):
+        pass
+
+    def claim(self, limit):
+        table = self.table
+        now = datetime.utcnow()
+        # SKIP LOCKED keeps Postgres workers from queueing behind each other;
+        # SQLite renders no locking clause and serializes the UPDATE instead
+        due = select(table.c.id).where(
+            table.c.status == QUEUED, table.c.run_at <= now,
+            or_(table.c.locked_until.is_(None), table.c.locked_until < now)
+        ).order_by(table.c.run_at, table.c.id).limit(limit).with_for_update(skip_locked=True)
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                table.update().where(table.c.id.in_(due.scalar_subquery()))
+                .values(attempts=table.c.attempts + 1, locked_until=now + timedelta(seconds=LEASE_SECONDS))
+                .returning(table.c.id, table.c.name, table.c.payload, table.c.attempts)
+            ).all()
+        return sorted((ClaimedJob(*row) for row in rows), key=lambda job: job.id)
+
+    def update(self, job_id, **values):
+        with self.engine.begin() as connection:
+            return connection.execute(
+                self.table.update().where(self.table.c.id == job_id).values(**values)).rowcount
+
+    def complete(self, job):
+        with self.engine.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.id == job.id))
+
+    def retry(self, job, run_at, error):
+        self.update(job.id, run_at=run_at, locked_until=None, last_error=error)
+
+    def bury(self, job, error):
+        self.update(job.id, status=DEAD, locked_until=None, last_error=error)
+
+    def counts(self):
+        with self.engine.connect() as connection:
+            return dict(connection.execute(
+                select(self.table.c.status, func.count()).group_by(self.table.c.status)).all())
+
+    def dead(self, limit):
+        table = self.table
+        with self.engine.connect() as connection:
+            return [row._asdict() for row in connection.execute(
+                select(table.c.id, table.c.name, table.c.attempts, table.c.last_error, table.c.created_at)
+                .where(table.c.status == DEAD).order_by(table.c.id.desc()).limit(limit))]
+
+    def requeue(self, job_id):
+        table = self.table
+        with self.engine.begin() as connection:
+            return connection.execute(table.update().where(table.c.id == job_id, table.c.status == DEAD).values(
+                status=QUEUED, attempts=0, run_at=datetime.utcnow(), last_error=None)).rowcount > 0
+
+
+class MemoryJobStore:
+    """Jobs kept in this process and lost when it exits, for tests and
+    single-process development."""
+
+    def __init__(self, app):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = {}
+
+    def add(self, session, jobs):
+        # Enqueueing alone would not begin a transaction to commit or roll back
+        if not session.in_transaction():
+            session.begin()
+        session.info.setdefault('memory_jobs', []).extend(jobs)
+
+    def committed(self, session):
+        with self._lock:
+            for job in session.info.pop('memory_jobs', ()):
+                job_id = next(self._ids)
+                self._jobs[job_id] = dict(job, id=job_id, status=QUEUED, attempts=0, locked_until=None,
+                                          last_error=None, created_at=datetime.utcnow())
+
+    def discard(self, session):
+        session.info.pop('memory_jobs', None)
+
+    def claim(self, limit):
+        now = datetime.utcnow()
+        with self._lock:
+            due = sorted((job for job in self._jobs.values()
+                          if job['status'] == QUEUED and job['run_at'] <= now
+                          and (job['locked_until'] is None or job['locked_until'] < now)),
+                         key=lambda job: (job['run_at'], job['id']))[:limit]
+            for job in due:
+                job['attempts'] += 1
+                job['locked_until'] = now + timedelta(seconds=LEASE_SECONDS)
+            return [ClaimedJob(job['id'], job['name'], job['payload'], job['attempts']) for job in due]
+
+    def update(self, job_id, **values):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(values)
+
+    def complete(self, job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def retry(self, job, run_at, error):
+        self.update(job.id, run_at=run_at, locked_until=None, last_error=error)
+
+    def bury(self, job, error):
+        self.update(job.id, status=DEAD, locked_until=None, last_error=error)
+
+    def counts(self):
+        with self._lock:
+            return dict(Counter(job['status'] for job in self._jobs.values()))
+
+    def dead(self, limit):
+        with self._lock:
+            dead = sorted((job for job in self._jobs.values() if job['status'] == DEAD),
+                          key=lambda job: job['id'], reverse=True)[:limit]
+            return [{key: job[key] for key in ('id', 'name', 'attempts', 'last_error', 'created_at')}
+                    for job in dead]
+
+    def requeue(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != DEAD:
+                return False
+            job.update(status=QUEUED, attempts=0, run_at=datetime.utcnow(), last_error=None)
+            return True
+
+
+JOB_STORES = {
+    'database': DatabaseJobStore,
+    'memory': MemoryJobStore
+}
+
+
+class JobQueue:
+    """An app's job store, its workers and their metrics. ``handlers`` maps
+    job names to functions taking the job's payload; ``start_task`` is
+    SocketIO's ``start_background_task``, so workers cooperate with the
+    async mode in use."""
+
+    def __init__(self, app, store, handlers, registry, start_task):
+        self.app = app
+        self.store = store
+        self.handlers = dict(handlers)
+        self._start_task = start_task
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.enqueued = registry.counter('jobs_enqueued_total', 'Background jobs enqueued.', ('job',))
+        self.processed = registry.counter(
+            'jobs_processed_total', 'Background job runs by outcome: done, retry or dead.', ('job', 'outcome'))
+        self.duration = registry.histogram('job_duration_seconds', 'Time spent running a background job.', ('job',))
+
+    def enqueue(self, name, payload, session=None):
+        session = session or db.session()
+        self.store.add(session, [{'name': name, 'payload': json.dumps(payload), 'run_at': datetime.utcnow()}])
+        session.info['jobs_enqueued'] = True
+        self.enqueued.inc(job=name)
+
+    def committed(self, session):
+        self.store.committed(session)
+        self.wake()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def start(self, workers=None):
+        # Started by the first commit that enqueues in each process, so the
+        # master of a pre-forking server never runs workers its children lose
+        workers = self.app.config['JOB_WORKERS'] if workers is None else workers
+        if not workers or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                for _ in range(workers):
+                    self._start_task(self.work)
+
+    def work(self):
+        while True:
+            try:
+                jobs = self.store.claim(CLAIM_BATCH_SIZE)
+                for job in jobs:
+                    self.run(job)
+            except Exception:
+                # The store is unreachable; leased jobs come back when it is
+                self.app.logger.exception('Job worker could not reach the %s store',
+                                          self.app.config['JOB_STORE'])
+                jobs = []
+            if not jobs:
+                self._wake.wait(self.app.config['JOB_POLL_SECONDS'])
+                self._wake.clear()
+
+    def run(self, job):
+        started = time.perf_counter()
+        try:
+            handler = self.handlers.get(job.name)
+            if handler is None:
+                raise LookupError(f'No handler for job {job.name}')
+            with self.app.app_context():
+                handler(json.loads(job.payload))
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            if job.attempts >= self.app.config['JOB_MAX_ATTEMPTS']:
+                self.app.logger.error('Job %s (%s) failed %d times, giving up: %s',
+                                      job.id, job.name, job.attempts, error)
+                self.store.bury(job, error)
+                outcome = 'dead'
+            else:
+                self.store.retry(job, datetime.utcnow() + timedelta(seconds=self.backoff(job.attempts)), error)
+                outcome = 'retry'
+        else:
+            self.store.complete(job)
+            outcome = 'done'
+        self.processed.inc(job=job.name, outcome=outcome)
+        self.duration.observe(time.perf_counter() - started, job=job.name)
+
+    def backoff(self, attempts):
+        # Exponential with jitter, so jobs that failed together spread out
+        delay = min(MAX_RETRY_SECONDS, self.app.config['JOB_RETRY_SECONDS'] * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+
+def init_jobs(app, registry, handlers, start_task):
+    store = JOB_STORES[app.config['JOB_STORE']](app)
+    app.extensions['jobs'] = JobQueue(app, store, handlers, registry, start_task)
+
+
+def jobs():
+    return current_app.extensions['jobs']
+
+
+def enqueue(name, payload):
+    """Run job ``name`` with ``payload`` once the current transaction
+    commits."""
+    jobs().enqueue(name, payload)
+
+
+@event.listens_for(db.session, 'after_commit')
+def release_jobs(session):
+    if session.info.pop('jobs_enqueued', False):
+        jobs().committed(session)
+
+
+# Soft rollback, as a transaction that only enqueued into the memory store
+# never reached the database
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard_jobs(session, previous_transaction):
+    if previous_transaction.parent is None and session.info.pop('jobs_enqueued', False):
+        jobs().store.discard(session)
+
+
+@click.command('work-jobs')
+@click.option('--workers', type=int, help='Worker threads, JOB_WORKERS by default.')
+@with_appcontext
+def work_jobs_command(workers):
+    """Run background job workers in the foreground, for deployments that
+    set JOB_WORKERS=0 on the web processes."""
+    queue = jobs()
+    queue.start(workers or queue.app.config['JOB_WORKERS'] or 1)
+    click.echo(f'Running jobs from the {current_app.config["JOB_STORE"]} store, Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
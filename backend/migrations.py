@@ -0,0 +1,139 @@
+"""Versioned schema migrations.
+
+The applied version is kept in the schema_version table. An empty database
+gets the current schema from the models in one step and is stamped with
+the latest version. A database created before versioning is taken to be at
+version 1, the original schema, and brought forward one migration at a
+time, each in its own transaction.
+
+A schema change to the models needs a migration appended to MIGRATIONS
+that makes the same change to existing databases.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+
+from ranks import rebuild_ranks
+from rollups import rebuild_rollups
+from search import create_search_index, refresh_search_index
+
+version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+LEGACY_VERSION = 1
+
+
+def add_counters_change_log_and_indexes(connection, metadata):
+    for name in ('project_task_count', 'change_log'):
+        metadata.tables[name].create(connection, checkfirst=True)
+    indexes = ('ix_project_owner_id', 'ix_project_member_user_project',
+               'ix_project_member_project_id', 'ix_task_project_status', 'ix_task_assignee_status',
+               'ix_task_status', 'ix_task_updated_at_id', 'ix_task_comment_task_id',
+               'ix_time_entry_task_duration', 'ix_time_entry_user_id', 'ix_time_entry_start_time')
+    for table in metadata.tables.values():
+        for index in table.indexes:
+            if index.name in indexes:
+                index.create(connection, checkfirst=True)
+    counts = metadata.tables['project_task_count']
+    task = metadata.tables['task']
+    connection.execute(counts.delete())
+    connection.execute(counts.insert().from_select(
+        ['project_id', 'status', 'count'],
+        select(task.c.project_id, task.c.status, func.count(task.c.id))
+        .group_by(task.c.project_id, task.c.status)
+    ))
+
+
+def add_task_search_index(connection, metadata):
+    create_search_index(connection)
+    refresh_search_index(connection)
+
+
+def add_time_rollups_and_task_flow(connection, metadata):
+    for name in ('time_rollup', 'project_task_flow'):
+        metadata.tables[name].create(connection, checkfirst=True)
+    rebuild_rollups(connection)
+
+
+def add_job_queue(connection, metadata):
+    metadata.tables['job'].create(connection, checkfirst=True)
+
+
+def add_task_version(connection, metadata):
+    # A constant default is stored once in the catalog by SQLite and
+    # Postgres 11+, so existing rows are not rewritten
+    if 'version' not in {c['name'] for c in inspect(connection).get_columns('task')}:
+        connection.execute(text('ALTER TABLE task ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+
+
+def add_task_rank(connection, metadata):
+    if 'rank' not in {c['name'] for c in inspect(connection).get_columns('task')}:
+        connection.execute(text('ALTER TABLE task ADD COLUMN rank VARCHAR(64)'))
+    for index in metadata.tables['task'].indexes:
+        if index.name == 'ix_task_project_status_rank':
+            index.create(connection, checkfirst=True)
+    rebuild_ranks(connection)
+
+
+# (version, description, function(connection, metadata)), in order
+MIGRATIONS = [
+    (2, 'task counters, change log and query indexes', add_counters_change_log_and_indexes),
+    (3, 'full-text task search index', add_task_search_index),
+    (4, 'time rollups and task flow for analytics', add_time_rollups_and_task_flow),
+    (5, 'background job queue', add_job_queue),
+    (6, 'task version for optimistic concurrency', add_task_version),
+    (7, 'task ranks for Kanban ordering', add_task_rank),
+]
+
+HEAD = MIGRATIONS[-1][0] if MIGRATIONS else LEGACY_VERSION
+
+
+def current_version(connection):
+    if not inspect(connection).has_table('schema_version'):
+        return None
+    return connection.execute(
+        select(func.max(schema_version.c.version))
+    ).scalar()
+
+
+def stamp(connection, version, description):
+    connection.execute(schema_version.insert().values(
+        version=version, description=description, applied_at=datetime.utcnow()))
+
+
+def create_schema(connection, metadata):
+    """Create every table of ``metadata`` and mark the database current."""
+    metadata.create_all(connection)
+    version_metadata.create_all(connection)
+    stamp(connection, HEAD, 'created from the models')
+
+
+def migrate(engine, metadata, log=print):
+    """Bring the database on ``engine`` to HEAD. Returns the migrations
+    applied as ``(version, description)`` pairs."""
+    with engine.begin() as connection:
+        version = current_version(connection)
+        if version is None:
+            if not inspect(connection).get_table_names():
+                create_schema(connection, metadata)
+                log(f'Created schema version {HEAD}')
+                return [(HEAD, 'created from the models')]
+            version_metadata.create_all(connection)
+            stamp(connection, LEGACY_VERSION, 'existing schema')
+            version = LEGACY_VERSION
+
+    applied = []
+    for number, description, upgrade in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            upgrade(connection, metadata)
+            stamp(connection, number, description)
+        log(f'Applied migration {number}: {description}')
+        applied.append((number, description))
+    return applied
@@ -0,0 +1,381 @@
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+
+from database import RoutingSession
+from ranks import assign_ranks
+from rollups import adjust_task_flow, adjust_time_rollups, increment, move_task_time
+from search import create_search_index, drop_search_index, refresh_search_index
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+TASK_STATUSES = ('todo', 'in_progress', 'completed')
+TASK_PRIORITIES = ('low', 'medium', 'high', 'critical')
+
+# Models
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password = db.Column(db.String(100), nullable=False)
+    role = db.Column(db.String(20), default='user')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    projects = db.relationship('Project', backref='owner', lazy=True)
+    assigned_tasks = db.relationship('Task', foreign_keys='Task.assignee_id', backref='assignee', lazy=True)
+    created_tasks = db.relationship('Task', foreign_keys='Task.created_by', backref='creator', lazy=True)
+
+class Project(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    status = db.Column(db.String(20), default='active')
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    tasks = db.relationship('Task', backref='project', lazy=True)
+    members = db.relationship('ProjectMember', backref='project', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_project_owner_id', 'owner_id'),
+    )
+
+class ProjectMember(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    role = db.Column(db.String(20), default='member')
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_project_member_user_project', 'user_id', 'project_id'),
+        db.Index('ix_project_member_project_id', 'project_id'),
+    )
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    status = db.Column(db.String(20), default='todo')
+    priority = db.Column(db.String(20), default='medium')
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    assignee_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    due_date = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by every edit of the task's fields, for optimistic concurrency:
+    # updates name the version they were based on and lose on a mismatch
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Order within the task's Kanban column (ranks.py); new tasks go last
+    rank = db.Column(db.String(64))
+    
+    comments = db.relationship('TaskComment', backref='task', lazy=True)
+    time_entries = db.relationship('TimeEntry', backref='task', lazy=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    # Match the filters used by get_tasks and get_dashboard_stats
+    __table_args__ = (
+        db.Index('ix_task_project_status', 'project_id', 'status'),
+        db.Index('ix_task_assignee_status', 'assignee_id', 'status'),
+        db.Index('ix_task_status', 'status'),
+        db.Index('ix_task_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_task_project_status_rank', 'project_id', 'status', 'rank'),
+    )
+
+class TaskComment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user = db.relationship('User', foreign_keys=[user_id], backref='comments')
+
+    __table_args__ = (
+        db.Index('ix_task_comment_task_id', 'task_id'),
+    )
+
+class TimeEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    description = db.Column(db.Text)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime)
+    duration = db.Column(db.Integer)  # in minutes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user = db.relationship('User', foreign_keys=[user_id], backref='time_entries')
+
+    __table_args__ = (
+        db.Index('ix_time_entry_task_duration', 'task_id', 'duration'),
+        db.Index('ix_time_entry_user_id', 'user_id'),
+        db.Index('ix_time_entry_start_time', 'start_time'),
+    )
+
+class ProjectTaskCount(db.Model):
+    # Denormalized task totals per project and status, kept in step with
+    # the task table by the flush hook below
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class TimeRollup(db.Model):
+    # Minutes logged per day, week and month, project and user, kept in step
+    # with the time entries by the flush hook below (see rollups.py). A
+    # project or user of 0 marks the rows summing over all of them, so the
+    # ids are not foreign keys
+    period = db.Column(db.String(5), primary_key=True)  # day, week or month
+    project_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    entries = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_time_rollup_user', 'period', 'user_id', 'period_start', 'project_id'),
+    )
+
+class ProjectTaskFlow(db.Model):
+    # Tasks added to and completed in a project per day, updated with the
+    # task counters; project 0 sums over every project
+    project_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    added = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    # Background job queue (jobs.py). Rows are inserted in the transaction
+    # of the write they belong to and deleted once the job has run; jobs
+    # out of attempts stay behind as dead letters
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued or dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+class ChangeLog(db.Model):
+    # Append-only feed of entity writes; the id is the /api/sync cursor.
+    # AUTOINCREMENT keeps SQLite from reusing ids, so cursors only move forward
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # upsert or delete
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Change log
+SYNC_ENTITIES = {
+    'tasks': Task,
+    'projects': Project,
+    'members': ProjectMember,
+    'comments': TaskComment,
+    'time_entries': TimeEntry
+}
+SYNC_KEYS = {model.__tablename__: key for key, model in SYNC_ENTITIES.items()}
+CHANGE_LOG_LOCK = 7311
+# Operation of the marker a reset leaves as the first row of the log
+RESET = 'reset'
+
+def record_changes(connection, changes):
+    """Append ``(table name, entity id, operation)`` rows to the change log
+    on ``connection``, inside the caller's transaction."""
+    if not changes:
+        return
+    if connection.dialect.name == 'postgresql':
+        # Serialize change-producing transactions until commit, so log ids
+        # become visible in order and a reader never skips past a row that
+        # commits later with a lower id
+        connection.execute(db.text('SELECT pg_advisory_xact_lock(:key)'), {'key': CHANGE_LOG_LOCK})
+    now = datetime.utcnow()
+    connection.execute(ChangeLog.__table__.insert(), [
+        {'entity': entity, 'entity_id': entity_id, 'operation': operation, 'changed_at': now}
+        for entity, entity_id, operation in changes
+    ])
+
+def record_reset(connection, after=None):
+    """Empty the change log and restart it with a reset marker, for writes
+    the log cannot list row by row, such as a reseed. /api/sync answers a
+    cursor from before the marker with ``reset``. ``after`` is the last id of
+    a log whose table was dropped, so ids keep moving forward past it."""
+    table = ChangeLog.__table__
+    connection.execute(table.delete())
+    if after is None:
+        # The id sequence survives the DELETE, so the marker lands above
+        # every cursor handed out before
+        record_changes(connection, [('*', 0, RESET)])
+        return
+    connection.execute(table.insert(), {'id': after + 1, 'entity': '*', 'entity_id': 0,
+                                        'operation': RESET, 'changed_at': datetime.utcnow()})
+    if connection.dialect.name == 'postgresql':
+        connection.execute(db.text("SELECT setval(pg_get_serial_sequence('change_log', 'id'), :id)"),
+                           {'id': after + 1})
+
+@event.listens_for(db.session, 'after_flush')
+def log_changes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if obj.__tablename__ in SYNC_KEYS:
+            changes.append((obj.__tablename__, obj.id, 'upsert'))
+    for obj in session.dirty:
+        if obj.__tablename__ in SYNC_KEYS and session.is_modified(obj, include_collections=False):
+            changes.append((obj.__tablename__, obj.id, 'upsert'))
+    for obj in session.deleted:
+        if obj.__tablename__ in SYNC_KEYS:
+            changes.append((obj.__tablename__, obj.id, 'delete'))
+    record_changes(session.connection(), changes)
+
+# Task counters
+def adjust_task_counts(connection, deltas):
+    """Apply ``{(project_id, status): delta}`` to the counter table and to
+    today's task flow as upserts on ``connection``, inside the caller's
+    transaction."""
+    increment(connection, ProjectTaskCount.__table__, ('project_id', 'status'),
+              [{'project_id': project_id, 'status': status, 'count': delta}
+               for (project_id, status), delta in deltas.items() if delta])
+    adjust_task_flow(connection, deltas, datetime.utcnow().date())
+
+def rebuild_task_counts():
+    db.session.execute(ProjectTaskCount.__table__.delete())
+    db.session.execute(ProjectTaskCount.__table__.insert().from_select(
+        ['project_id', 'status', 'count'],
+        db.select(Task.project_id, Task.status, db.func.count(Task.id))
+          .group_by(Task.project_id, Task.status)
+    ))
+    db.session.commit()
+
+@event.listens_for(db.session, 'after_flush')
+def track_task_counts(session, flush_context):
+    deltas = {}
+
+    def bump(project_id, status, delta):
+        key = (project_id, status)
+        deltas[key] = deltas.get(key, 0) + delta
+
+    for obj in session.new:
+        if isinstance(obj, Task):
+            bump(obj.project_id, obj.status, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            bump(obj.project_id, obj.status, -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Task):
+            continue
+        state = inspect(obj)
+        project = state.attrs.project_id.history
+        status = state.attrs.status.history
+        if not (project.has_changes() or status.has_changes()):
+            continue
+        old_project = project.deleted[0] if project.deleted else obj.project_id
+        old_status = status.deleted[0] if status.deleted else obj.status
+        bump(old_project, old_status, -1)
+        bump(obj.project_id, obj.status, 1)
+
+    if deltas:
+        adjust_task_counts(session.connection(), deltas)
+
+@event.listens_for(db.session, 'after_flush')
+def touch_parent_tasks(session, flush_context):
+    # Comments and time entries feed comment_count and time_spent, so writing
+    # one bumps its task's updated_at and with it the task list validators
+    task_ids = {obj.task_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+                if isinstance(obj, (TaskComment, TimeEntry)) and obj.task_id}
+    if task_ids:
+        table = Task.__table__
+        session.connection().execute(table.update().where(table.c.id.in_(task_ids))
+                                     .values(updated_at=datetime.utcnow()))
+        record_changes(session.connection(), [('task', task_id, 'upsert') for task_id in task_ids])
+
+# Time rollups
+def committed_value(obj, name):
+    history = inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(obj, name)
+
+@event.listens_for(db.session, 'after_flush')
+def track_time_rollups(session, flush_context):
+    moves = {}
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            old_project = committed_value(obj, 'project_id')
+            if old_project != obj.project_id:
+                moves[obj.id] = (old_project, obj.project_id)
+    new = [obj for obj in session.new if isinstance(obj, TimeEntry)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, TimeEntry)]
+    changed = [obj for obj in session.dirty if isinstance(obj, TimeEntry) and any(
+        inspect(obj).attrs[name].history.has_changes()
+        for name in ('task_id', 'user_id', 'start_time', 'duration'))]
+    if not (moves or new or deleted or changed):
+        return
+
+    connection = session.connection()
+    task_ids = {obj.task_id for obj in new + changed} | \
+               {committed_value(obj, 'task_id') for obj in deleted + changed}
+    projects = dict(connection.execute(
+        db.select(Task.id, Task.project_id).where(Task.id.in_(task_ids))).all()) if task_ids else {}
+    # Entries are taken out of the project their task was in before the flush
+    old_projects = dict(projects)
+    old_projects.update({task_id: old for task_id, (old, _) in moves.items()})
+    old_projects.update({obj.id: committed_value(obj, 'project_id')
+                         for obj in session.deleted if isinstance(obj, Task)})
+
+    entries = []
+    for obj in new + changed:
+        entries.append((projects[obj.task_id], obj.user_id, obj.start_time, obj.duration, 1))
+    for obj in deleted + changed:
+        old = {name: committed_value(obj, name) for name in ('task_id', 'user_id', 'start_time', 'duration')}
+        entries.append((old_projects[old['task_id']], old['user_id'], old['start_time'], old['duration'], -1))
+    adjust_time_rollups(connection, entries)
+    move_task_time(connection, moves, skip={obj.id for obj in new + deleted + changed})
+
+# Kanban ranks
+@event.listens_for(db.session, 'before_flush')
+def rank_new_tasks(session, flush_context, instances):
+    tasks = [obj for obj in session.new if isinstance(obj, Task) and obj.rank is None]
+    if tasks:
+        assign_ranks(session.connection(), tasks, Task.status.default.arg)
+
+# Search index
+@event.listens_for(db.metadata, 'after_create')
+def create_search_table(target, connection, **kw):
+    # The index is an FTS5 or tsvector table outside the models, created and
+    # dropped along with them
+    create_search_index(connection)
+
+@event.listens_for(db.metadata, 'before_drop')
+def drop_search_table(target, connection, **kw):
+    drop_search_index(connection)
+
+@event.listens_for(db.session, 'after_flush')
+def index_task_text(session, flush_context):
+    task_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Task):
+            task_ids.add(obj.id)
+        elif isinstance(obj, TaskComment):
+            task_ids.add(obj.task_id)
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            state = inspect(obj)
+            if state.attrs.title.history.has_changes() or state.attrs.description.history.has_changes():
+                task_ids.add(obj.id)
+        elif isinstance(obj, TaskComment) and session.is_modified(obj, include_collections=False):
+            task_ids.add(obj.task_id)
+    task_ids.discard(None)
+    if task_ids:
+        refresh_search_index(session.connection(), task_ids)
+
+# Set up the ORM mappers on import, so it happens once in a pre-forking
+# server's master instead of during the first query of every worker
+db.configure_mappers()
@@ -0,0 +1,138 @@
+import io
+import os
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+from metrics import COUNT_BUCKETS, SIZE_BUCKETS, MetricsRegistry
+
+PROFILE_TOP_FUNCTIONS = 30
+# Only one profiler can be active in a process (Python 3.12 raises for a
+# second one), so concurrent profiled requests take turns
+PROFILE_LOCK = threading.Lock()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.size = 0
+        self.profiler = None
+
+
+class RequestMonitor:
+    """HTTP and database metrics of one app, and its request profiles."""
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.requests = registry.counter(
+            'http_requests_total', 'HTTP requests served.', ('endpoint', 'method', 'status'))
+        self.latency = registry.histogram(
+            'http_request_duration_seconds', 'Time from the start of a request until its body was sent.',
+            ('endpoint', 'method'))
+        self.response_size = registry.histogram(
+            'http_response_size_bytes', 'Response body size.', ('endpoint',), SIZE_BUCKETS)
+        self.db_queries = registry.histogram(
+            'db_queries_per_request', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS)
+        self.db_query_time = registry.counter(
+            'db_query_seconds_total', 'Time spent executing SQL statements.', ('endpoint',))
+
+    def record(self, state, endpoint, method, status, label):
+        elapsed = time.perf_counter() - state.started
+        self.requests.inc(endpoint=endpoint, method=method, status=status)
+        self.latency.observe(elapsed, endpoint=endpoint, method=method)
+        self.response_size.observe(state.size, endpoint=endpoint)
+        self.db_queries.observe(state.queries, endpoint=endpoint)
+        self.db_query_time.inc(state.query_time, endpoint=endpoint)
+        if state.profiler is not None:
+            state.profiler.disable()
+            PROFILE_LOCK.release()
+            if elapsed * 1000 >= self.app.config['PROFILE_SLOW_MS']:
+                self.dump_profile(state.profiler, endpoint, label, elapsed)
+
+    def dump_profile(self, profiler, endpoint, label, elapsed):
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        self.app.logger.warning('Profile of %s (%.1f ms, %d functions shown)\n%s',
+                                label, elapsed * 1000, PROFILE_TOP_FUNCTIONS, out.getvalue())
+        if self.app.config['PROFILE_DIR']:
+            path = os.path.join(self.app.config['PROFILE_DIR'], f'{endpoint}-{time.time():.3f}.prof')
+            profiler.dump_stats(path)
+
+
+def init_monitoring(app, engines):
+    """Give ``app`` a metrics registry (``app.extensions['metrics']``) and
+    record every request and the statements it runs on ``engines``."""
+    registry = app.extensions['metrics'] = MetricsRegistry()
+    app.extensions['request_monitor'] = RequestMonitor(app, registry)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', start_query_timer)
+        event.listen(engine, 'after_cursor_execute', record_query)
+    app.before_request(start_request_metrics)
+    app.after_request(finish_request_metrics)
+
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    # Statements outside a request (startup, background tasks) are not counted
+    state = g.get('request_metrics') if has_app_context() else None
+    if state is not None:
+        state.queries += 1
+        state.query_time += time.perf_counter() - conn.info['query_started']
+
+
+def start_request_metrics():
+    state = g.request_metrics = RequestMetrics()
+    if current_app.config['REQUEST_PROFILING'] and request.headers.get('X-Profile'):
+        import cProfile
+
+        if not PROFILE_LOCK.acquire(blocking=False):
+            current_app.logger.info('Not profiling %s, another profile is running', request.full_path)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool, outside this app, holds the profiler
+            PROFILE_LOCK.release()
+            current_app.logger.info('Not profiling %s, a profiler is already active', request.full_path)
+            return
+        state.profiler = profiler
+
+
+def count_body(body, state):
+    try:
+        for chunk in body:
+            state.size += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def finish_request_metrics(response):
+    state = g.get('request_metrics')
+    if state is None:
+        return response
+    monitor = current_app.extensions['request_monitor']
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method
+    label = f'{method} {request.full_path}' if state.profiler is not None else None
+    if response.is_streamed and response.content_length is None:
+        # Recorded once the body has been sent, so streamed responses are
+        # timed in full, including the queries that run while they stream
+        response.response = count_body(response.response, state)
+        response.call_on_close(
+            lambda: monitor.record(state, endpoint, method, response.status_code, label))
+    else:
+        state.size = response.content_length or 0
+        monitor.record(state, endpoint, method, response.status_code, label)
+    return response
@@ -0,0 +1,141 @@
+"""Fractional rank keys for the order of tasks within a Kanban column.
+
+A rank is a base-36 fraction written without its leading "0.", so keys
+compare as plain strings in SQL and Python alike and there is always room
+for another key between two neighbours. Moving a card rewrites its own rank
+and nothing else. Repeated moves into the same gap make keys longer; once
+one is longer than REBALANCE_LENGTH its column is re-spaced by a background
+job, which keeps the order and rewrites every rank in the column.
+
+Keys never end in "0", so none is equal to a different key with trailing
+zeros. Concurrent moves into the same gap can produce equal ranks, so
+columns are ordered by rank and then id.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, column, func, select, table
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+# Fresh keys have RANK_WIDTH digits and are RANK_STEP apart, which leaves room
+# for about 15 halvings of each gap before a key gets longer
+RANK_WIDTH = 6
+RANK_STEP = BASE ** 3
+REBALANCE_LENGTH = 12
+UPDATE_BATCH_SIZE = 5000
+
+task = table('task', column('id'), column('project_id'), column('status'), column('rank'),
+             column('updated_at'))
+
+
+def rank_value(key, width):
+    return int((key or '').ljust(width, '0')[:width], BASE) if key else 0
+
+
+def rank_key(value, width):
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits)).rstrip('0')
+
+
+def ranks_between(before, after, count=1):
+    """``count`` keys evenly spaced strictly between ``before`` and ``after``,
+    either of which may be None for an open end."""
+    if before and after and before >= after:
+        raise ValueError(f'Rank {before!r} does not sort before {after!r}')
+    width = max(len(before or ''), len(after or ''), 1)
+    while True:
+        low = rank_value(before, width)
+        high = rank_value(after, width) if after else BASE ** width
+        if high - low > count:
+            step = (high - low) // (count + 1)
+            return [rank_key(low + step * (i + 1), width) for i in range(count)]
+        width += 1
+
+
+def ranks_after(last, count=1):
+    """``count`` keys after ``last`` (None for an empty column), RANK_STEP
+    apart so later moves have room between them."""
+    start = rank_value(last, RANK_WIDTH) + RANK_STEP
+    if start + RANK_STEP * (count - 1) >= BASE ** RANK_WIDTH:
+        return ranks_between(last, None, count)
+    return [rank_key(start + RANK_STEP * i, RANK_WIDTH) for i in range(count)]
+
+
+def needs_rebalance(key):
+    return len(key) > REBALANCE_LENGTH
+
+
+def last_ranks(connection, columns):
+    """The highest rank in each ``(project_id, status)`` column."""
+    project_ids = {project_id for project_id, _ in columns}
+    if not project_ids:
+        return {}
+    rows = connection.execute(
+        select(task.c.project_id, task.c.status, func.max(task.c.rank))
+        .where(task.c.project_id.in_(project_ids)).group_by(task.c.project_id, task.c.status))
+    return {(project_id, status): rank for project_id, status, rank in rows}
+
+
+def assign_ranks(connection, rows, default_status):
+    """Give each task in ``rows`` (dicts or objects) without a rank one at the
+    end of its column, in the order given."""
+    def get(row, name):
+        return row.get(name) if isinstance(row, dict) else getattr(row, name)
+
+    columns = {}
+    for row in rows:
+        if get(row, 'rank') is None:
+            columns.setdefault((get(row, 'project_id'), get(row, 'status') or default_status), []).append(row)
+    last = last_ranks(connection, columns)
+    for key, members in columns.items():
+        for row, rank in zip(members, ranks_after(last.get(key), len(members))):
+            if isinstance(row, dict):
+                row['rank'] = rank
+            else:
+                row.rank = rank
+
+
+def rebalance_column(connection, project_id, status):
+    """Re-space the ranks of one column, keeping its order. Returns the new
+    ``(task id, rank)`` pairs."""
+    # Locked in id order, the order moves lock their rows in, and sorted
+    # here, so a rebalance and a move never wait on each other in a cycle.
+    # On SQLite the caller holds the write lock instead
+    rows = connection.execute(
+        select(task.c.id, task.c.rank).where(task.c.project_id == project_id, task.c.status == status)
+        .order_by(task.c.id).with_for_update()).all()
+    ids = [task_id for task_id, _ in sorted(rows, key=lambda row: (row.rank or '', row.id))]
+    ranks = list(zip(ids, ranks_after(None, len(ids))))
+    write_ranks(connection, ranks, datetime.utcnow())
+    return ranks
+
+
+def rebuild_ranks(connection):
+    """Rank every task, keeping any existing order within each column and
+    ordering unranked tasks by id."""
+    rows = connection.execute(
+        select(task.c.id, task.c.project_id, task.c.status)
+        .order_by(task.c.project_id, task.c.status, task.c.rank, task.c.id))
+    ranks, column_ids, current = [], [], None
+    for task_id, project_id, status in rows:
+        if (project_id, status) != current:
+            ranks.extend(zip(column_ids, ranks_after(None, len(column_ids))))
+            column_ids, current = [], (project_id, status)
+        column_ids.append(task_id)
+    ranks.extend(zip(column_ids, ranks_after(None, len(column_ids))))
+    write_ranks(connection, ranks)
+
+
+def write_ranks(connection, ranks, updated_at=None):
+    # A rebalance moves updated_at so the list validators change along with
+    # the ranks; the rebuild in a migration leaves it alone
+    values = {'rank': bindparam('new_rank')}
+    if updated_at is not None:
+        values['updated_at'] = updated_at
+    statement = task.update().where(task.c.id == bindparam('task_id')).values(values)
+    rows = [{'task_id': task_id, 'new_rank': rank} for task_id, rank in ranks]
+    for start in range(0, len(rows), UPDATE_BATCH_SIZE):
+        connection.execute(statement, rows[start:start + UPDATE_BATCH_SIZE])
@@ -0,0 +1,173 @@
+"""Pre-aggregated time tracking and task flow for the analytics API.
+
+time_rollup holds the minutes logged and the entries started per day, week
+(starting Monday) and month, per project and user. project_task_flow holds
+the tasks added to and completed in each project per day, from which
+burn-down and velocity follow. Both are counters that writes add to inside
+their own transaction, so a report reads one row per period and key no
+matter how many entries or tasks are behind it.
+
+Totals are stored as rows of their own, with ALL (0) in place of the
+project or user they sum over, so a report over every project or user is
+as cheap as one over a single project.
+
+A time entry counts toward the period its start_time falls in and the
+project its task is in; moving a task moves its time along with it.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import Date, DateTime, column, func, select, table
+
+PERIODS = ('day', 'week', 'month')
+ALL = 0
+DONE_STATUS = 'completed'
+INSERT_BATCH_SIZE = 5000
+
+time_rollup = table('time_rollup', column('period'), column('period_start', Date), column('project_id'),
+                    column('user_id'), column('minutes'), column('entries'))
+task_flow = table('project_task_flow', column('project_id'), column('day', Date), column('added'),
+                  column('completed'))
+time_entry = table('time_entry', column('id'), column('task_id'), column('user_id'),
+                   column('start_time', DateTime), column('duration'))
+task = table('task', column('id'), column('project_id'), column('status'), column('created_at'),
+             column('updated_at'))
+
+TIME_KEYS = ('period', 'project_id', 'user_id', 'period_start')
+FLOW_KEYS = ('project_id', 'day')
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def increment(connection, target, keys, rows):
+    """Add the non-key values of each row in ``rows`` to the ``target`` row
+    with the same ``keys``, creating it when there is none."""
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    # Imported here so only the dialect in use gets loaded
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    counters = [name for name in rows[0] if name not in keys]
+    if dialect in ('sqlite', 'postgresql'):
+        statement = insert(target)
+        statement = statement.on_conflict_do_update(
+            index_elements=[target.c[key] for key in keys],
+            set_={name: target.c[name] + statement.excluded[name] for name in counters}
+        )
+        connection.execute(statement, rows)
+        return
+    for row in rows:
+        updated = connection.execute(
+            target.update().where(*[target.c[key] == row[key] for key in keys])
+            .values({name: target.c[name] + row[name] for name in counters}))
+        if not updated.rowcount:
+            connection.execute(target.insert().values(row))
+
+
+def add_time(totals, project_id, user_id, day, minutes, entries):
+    for period in PERIODS:
+        begins = period_start(period, day)
+        for key in ((period, project_id, user_id, begins), (period, project_id, ALL, begins),
+                    (period, ALL, user_id, begins), (period, ALL, ALL, begins)):
+            logged, count = totals.get(key, (0, 0))
+            totals[key] = (logged + minutes, count + entries)
+
+
+def time_rollup_rows(totals):
+    return [dict(zip(TIME_KEYS, key), minutes=logged, entries=count)
+            for key, (logged, count) in totals.items() if logged or count]
+
+
+def adjust_time_rollups(connection, entries):
+    """Add ``(project_id, user_id, start_time, minutes, sign)`` entries to
+    the rollups on ``connection``; a sign of -1 takes an entry out."""
+    totals = {}
+    for project_id, user_id, start_time, minutes, sign in entries:
+        add_time(totals, project_id, user_id, start_time.date(), sign * (minutes or 0), sign)
+    increment(connection, time_rollup, TIME_KEYS, time_rollup_rows(totals))
+
+
+def move_task_time(connection, moves, skip=()):
+    """Move the time logged on tasks that changed project, ``moves`` mapping
+    task id to ``(old project, new project)``. Entries in ``skip`` were
+    already accounted for by the caller."""
+    if not moves:
+        return
+    rows = connection.execute(
+        select(time_entry.c.id, time_entry.c.task_id, time_entry.c.user_id,
+               time_entry.c.start_time, time_entry.c.duration)
+        .where(time_entry.c.task_id.in_(list(moves))))
+    entries = []
+    for entry_id, task_id, user_id, start_time, minutes in rows:
+        if entry_id in skip:
+            continue
+        old_project, new_project = moves[task_id]
+        entries.append((old_project, user_id, start_time, minutes, -1))
+        entries.append((new_project, user_id, start_time, minutes, 1))
+    adjust_time_rollups(connection, entries)
+
+
+def adjust_task_flow(connection, deltas, day):
+    """Record ``{(project_id, status): delta}`` task count changes as tasks
+    added to and completed in each project on ``day``. A task leaving a
+    project, by moving or being deleted, is subtracted the same way, so the
+    running total of added minus completed is the open task count."""
+    totals = {}
+    for (project_id, status), delta in deltas.items():
+        for key in (project_id, ALL):
+            added, completed = totals.get(key, (0, 0))
+            totals[key] = (added + delta, completed + (delta if status == DONE_STATUS else 0))
+    increment(connection, task_flow, FLOW_KEYS,
+              [{'project_id': project_id, 'day': day, 'added': added, 'completed': completed}
+               for project_id, (added, completed) in totals.items() if added or completed])
+
+
+def as_date(value):
+    # date() comes back as text from SQLite and as a date from Postgres
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def insert_batches(connection, target, rows):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        connection.execute(target.insert(), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def rebuild_rollups(connection):
+    """Recompute both tables from the time entries and tasks. Days are
+    summed by the database and folded into weeks and months here. Tasks
+    completed before the flow was recorded count as completed on their
+    last update, the nearest date the schema keeps."""
+    connection.execute(time_rollup.delete())
+    connection.execute(task_flow.delete())
+
+    day = func.date(time_entry.c.start_time)
+    days = connection.execute(
+        select(task.c.project_id, time_entry.c.user_id, day,
+               func.coalesce(func.sum(time_entry.c.duration), 0), func.count())
+        .select_from(time_entry.join(task, task.c.id == time_entry.c.task_id))
+        .group_by(task.c.project_id, time_entry.c.user_id, day))
+    totals = {}
+    for project_id, user_id, logged_on, logged, count in days:
+        add_time(totals, project_id, user_id, as_date(logged_on), logged, count)
+    insert_batches(connection, time_rollup, time_rollup_rows(totals))
+
+    flow = {}
+    for counter, stamp, criteria in (('added', task.c.created_at, ()),
+                                     ('completed', task.c.updated_at, (task.c.status == DONE_STATUS,))):
+        day = func.date(stamp)
+        statement = select(task.c.project_id, day, func.count()) \
+            .where(stamp.isnot(None), *criteria).group_by(task.c.project_id, day)
+        for project_id, on, count in connection.execute(statement):
+            for key in ((project_id, as_date(on)), (ALL, as_date(on))):
+                row = flow.setdefault(key, {'added': 0, 'completed': 0})
+                row[counter] += count
+    insert_batches(connection, task_flow, [dict(zip(FLOW_KEYS, key), **counts)
+                                           for key, counts in flow.items()])
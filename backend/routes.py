@@ -0,0 +1,1524 @@
+from flask import Blueprint, current_app, jsonify, request, stream_with_context
+from datetime import datetime, timedelta
+from collections import Counter
+import base64
+import csv
+import hashlib
+import io
+import json
+
+from cache import cached
+from database import begin_write
+from importer import IMPORT_FORMATS, read_records, run_import
+from jobs import enqueue, jobs
+from models import (RESET, SYNC_ENTITIES, SYNC_KEYS, TASK_PRIORITIES, TASK_STATUSES, ChangeLog,
+                    Project, ProjectMember, ProjectTaskCount, ProjectTaskFlow, Task, TaskComment,
+                    TimeEntry, TimeRollup, User, adjust_task_counts, db, record_changes, record_reset)
+from ranks import assign_ranks, needs_rebalance, ranks_after, ranks_between, rebalance_column
+from rollups import ALL, PERIODS, adjust_time_rollups, move_task_time, period_start
+from sample_data import create_sample_data
+from search import refresh_search_index, search_clauses, search_terms
+from serializers import (comment_serializer, iter_json_array, member_serializer, project_serializer,
+                         task_serializer, time_entry_serializer, user_serializer)
+from sockets import (broadcast_after_commit, flush_task_updates_after_commit, project_room,
+                     queue_task_update_after_commit, realtime, user_room)
+
+api = Blueprint('api', __name__)
+
+# API helpers
+MAX_PAGE_SIZE = 500
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+def json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def parse_fields(allowed, default):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def parse_datetime_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f'Invalid datetime for {name}: {value}')
+
+def encode_cursor(values):
+    raw = json.dumps([json_value(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if isinstance(c.type, db.DateTime) else v
+                for c, v in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise ApiError('Invalid cursor')
+
+def keyset_after(columns, values):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), spelled out so it
+    # works on databases without row-value comparisons
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column > value
+    return db.or_(column > value,
+                  db.and_(column == value, keyset_after(columns[1:], values[1:])))
+
+def paginate_keyset(query, keys):
+    """Order ``query`` by ``keys`` ((column, row attribute) pairs) and apply
+    the ``cursor``/``limit`` request args. Returns the rows and the cursor of
+    the next page, or None when this is the last one."""
+    columns = [column for column, _ in keys]
+    query = query.order_by(*columns)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(keyset_after(columns, decode_cursor(cursor, columns)))
+
+    limit = request.args.get('limit', type=int)
+    if not limit:
+        return query.all(), None
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], attr) for _, attr in keys])
+
+# Lists at least this long are streamed in chunks instead of being encoded
+# into one string
+STREAM_MIN_ITEMS = 1000
+
+def list_response(rows, serialize, next_cursor):
+    if len(rows) >= STREAM_MIN_ITEMS:
+        body = iter_json_array(map(serialize, rows), current_app.json.dumps)
+        response = current_app.response_class(stream_with_context(body), mimetype='application/json')
+    else:
+        response = jsonify(serialize.many(rows))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def resource_etag(*validators):
+    # The path and query string are part of the tag because fields, filters
+    # and the page all change the body for the same underlying rows
+    raw = repr((request.path, request.query_string, validators)).encode()
+    return hashlib.sha1(raw).hexdigest()
+
+def not_modified(etag, last_modified, dated=True):
+    """Whether the client's copy is current. ``dated=False`` answers from
+    If-None-Match only, for a scope rows can leave: the newest change left
+    in scope can then be older than the client's copy although the list
+    changed, while the ETag counts the rows and moves."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if dated and last_modified and request.if_modified_since:
+        # HTTP dates have second precision
+        return last_modified.replace(microsecond=0) <= \
+            request.if_modified_since.replace(tzinfo=None)
+    return False
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified_response(etag, last_modified):
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
+
+# Dummy authentication endpoints
+@api.route('/api/auth/register', methods=['POST'])
+def register():
+    data = request.get_json()
+    user = User.query.filter_by(email=data['email']).first()
+    if not user:
+        user = User(
+            name=data['name'],
+            email=data['email'],
+            password=data['password'],
+            role=data.get('role', 'user')
+        )
+        db.session.add(user)
+        db.session.commit()
+    return jsonify({
+        'token': 'demo-token',
+        'user': user_serializer(USER_FIELDS)(user)
+    })
+
+@api.route('/api/auth/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    user = User.query.filter_by(email=data['email']).first()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify({
+        'token': 'demo-token',
+        'user': user_serializer(USER_FIELDS)(user)
+    })
+
+# Project routes
+PROJECT_FIELDS = ('id', 'name', 'description', 'status', 'owner_id', 'created_at',
+                  'task_count', 'completed_tasks', 'status_counts')
+PROJECT_COUNT_FIELDS = ('task_count', 'completed_tasks', 'status_counts')
+PROJECT_BASE_FIELDS = ('id', 'name', 'description', 'status', 'owner_id', 'created_at')
+
+def project_task_counts(project_ids):
+    """Task totals per project and status for ``project_ids``, read from the
+    counter table in a single GROUP BY with one conditional SUM per known
+    status."""
+    if not project_ids:
+        return {}
+    status_sums = [db.func.sum(db.case((ProjectTaskCount.status == s, ProjectTaskCount.count),
+                                       else_=0)).label(s)
+                   for s in TASK_STATUSES]
+    rows = db.session.query(
+        ProjectTaskCount.project_id,
+        db.func.sum(ProjectTaskCount.count).label('total'),
+        *status_sums
+    ).filter(ProjectTaskCount.project_id.in_(project_ids)) \
+     .group_by(ProjectTaskCount.project_id).all()
+    return {row.project_id: {
+        'total': row.total,
+        'statuses': {s: getattr(row, s) or 0 for s in TASK_STATUSES}
+    } for row in rows}
+
+@api.route('/api/projects', methods=['GET'])
+@cached('project', 'task')
+def get_projects():
+    fields = parse_fields(PROJECT_FIELDS, PROJECT_FIELDS)
+    status = request.args.get('status')
+    owner_id = request.args.get('owner_id', type=int)
+
+    query = Project.query
+    if status:
+        query = query.filter(Project.status == status)
+    if owner_id:
+        query = query.filter(Project.owner_id == owner_id)
+
+    # Projects are never edited in place, so their count, newest id and
+    # creation time plus the task validators cover every field served here
+    project_validators = query.with_entities(
+        db.func.count(Project.id), db.func.max(Project.id), db.func.max(Project.created_at)
+    ).one()
+    tasks_modified = db.session.query(db.func.max(Task.updated_at)).scalar()
+    last_modified = max(filter(None, (project_validators[2], tasks_modified)), default=None)
+    etag = resource_etag(tuple(project_validators), tasks_modified, task_count([]))
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    projects, next_cursor = paginate_keyset(query, [(Project.id, 'id')])
+
+    counts = {}
+    if any(f in PROJECT_COUNT_FIELDS for f in fields):
+        counts = project_task_counts([p.id for p in projects])
+    empty = {'total': 0, 'statuses': {s: 0 for s in TASK_STATUSES}}
+
+    base = project_serializer(tuple(f for f in fields if f not in PROJECT_COUNT_FIELDS))
+
+    def serialize(p):
+        item = base(p)
+        project_counts = counts.get(p.id, empty)
+        if 'task_count' in fields:
+            item['task_count'] = project_counts['total']
+        if 'completed_tasks' in fields:
+            item['completed_tasks'] = project_counts['statuses']['completed']
+        if 'status_counts' in fields:
+            item['status_counts'] = project_counts['statuses']
+        return item
+    serialize.many = lambda rows: [serialize(p) for p in rows]
+
+    return with_validators(list_response(projects, serialize, next_cursor), etag, last_modified)
+
+@api.route('/api/projects', methods=['POST'])
+def create_project():
+    data = request.get_json()
+    
+    project = Project(
+        name=data['name'],
+        description=data.get('description', ''),
+        owner_id=1 # Dummy owner for now
+    )
+    
+    db.session.add(project)
+    db.session.flush()
+    
+    # Add owner as member
+    member = ProjectMember(project_id=project.id, user_id=1, role='owner') # Dummy owner for now
+    db.session.add(member)
+    db.session.flush()
+    
+    project_data = project_serializer(PROJECT_BASE_FIELDS)(project)
+    # Nobody has joined the new project's room yet, so tell its owner directly
+    broadcast_after_commit('project_created', {'project': project_data}, user_room(project.owner_id))
+    db.session.commit()
+    
+    return jsonify(project_data)
+
+PROJECT_MEMBER_FIELDS = (('id', 'user_id'), 'role', 'joined_at')
+PROJECT_TASK_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'assignee_id',
+                       'due_date', 'created_at', 'rank')
+
+@api.route('/api/projects/<int:project_id>', methods=['GET'])
+def get_project(project_id):
+    project = Project.query.get_or_404(project_id)
+
+    members_joined, member_count = db.session.query(
+        db.func.max(ProjectMember.joined_at), db.func.count(ProjectMember.id)
+    ).filter(ProjectMember.project_id == project_id).one()
+    tasks_modified = db.session.query(db.func.max(Task.updated_at)) \
+        .filter(Task.project_id == project_id).scalar()
+    last_modified = max(filter(None, (project.created_at, members_joined, tasks_modified)))
+    etag = resource_etag(project.name, project.description, project.status, project.owner_id,
+                         last_modified, member_count,
+                         task_count([ProjectTaskCount.project_id == project_id]))
+    # Tasks can move to another project
+    if not_modified(etag, last_modified, dated=False):
+        return not_modified_response(etag, last_modified)
+
+    data = project_serializer(PROJECT_BASE_FIELDS)(project)
+    data['members'] = member_serializer(PROJECT_MEMBER_FIELDS).many(project.members)
+    data['tasks'] = task_serializer(PROJECT_TASK_FIELDS).many(project.tasks)
+    response = jsonify(data)
+    return with_validators(response, etag, last_modified)
+
+# Task routes
+TASK_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'project_id',
+               'assignee_id', 'assignee_name', 'due_date', 'created_at',
+               'comment_count', 'time_spent', 'version', 'rank')
+TASK_EXTRA_FIELDS = ('created_by', 'updated_at')
+# rank orders a Kanban column, through ix_task_project_status_rank when
+# project_id and status are both filtered on
+TASK_ORDERINGS = ('id', 'updated_at', 'rank')
+TASK_EVENT_FIELDS = ('id', 'title', 'status', 'project_id', 'version', 'rank')
+TASK_CREATED_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'project_id',
+                       'assignee_id', 'due_date', 'created_at', 'version', 'rank')
+TASK_UPDATED_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'project_id',
+                       'assignee_id', 'due_date', 'updated_at', 'version', 'rank')
+
+def task_filters():
+    """Criteria on Task for the request's filters, plus the same scope as
+    criteria on ProjectTaskCount when only project_id/status are used (None
+    otherwise), so the scope can be counted without touching the tasks."""
+    criteria = []
+    counter_criteria = []
+    project_id = request.args.get('project_id', type=int)
+    assignee_id = request.args.get('assignee_id', type=int)
+    status = request.args.get('status')
+    priority = request.args.get('priority')
+    due_after = parse_datetime_arg('due_after')
+    due_before = parse_datetime_arg('due_before')
+    updated_since = parse_datetime_arg('updated_since')
+    if project_id:
+        criteria.append(Task.project_id == project_id)
+        counter_criteria.append(ProjectTaskCount.project_id == project_id)
+    if assignee_id:
+        criteria.append(Task.assignee_id == assignee_id)
+    if status:
+        criteria.append(Task.status == status)
+        counter_criteria.append(ProjectTaskCount.status == status)
+    if priority:
+        criteria.append(Task.priority == priority)
+    if due_after:
+        criteria.append(Task.due_date >= due_after)
+    if due_before:
+        criteria.append(Task.due_date < due_before)
+    if updated_since:
+        criteria.append(Task.updated_at >= updated_since)
+    if len(counter_criteria) < len(criteria):
+        counter_criteria = None
+    return criteria, counter_criteria
+
+def task_count(counter_criteria):
+    return db.session.query(db.func.coalesce(db.func.sum(ProjectTaskCount.count), 0)) \
+        .filter(*counter_criteria).scalar()
+
+@api.route('/api/tasks', methods=['GET'])
+def get_tasks():
+    fields = parse_fields(TASK_FIELDS + TASK_EXTRA_FIELDS, TASK_FIELDS)
+    order_by = request.args.get('order_by', 'id')
+    if order_by not in TASK_ORDERINGS:
+        raise ApiError(f'Cannot order tasks by {order_by}')
+    filters, counter_filters = task_filters()
+
+    # Validators cover every task the filters select, so a change anywhere in
+    # scope (or a comment or time entry touching a task) changes the ETag
+    last_modified = db.session.query(db.func.max(Task.updated_at)).filter(*filters).scalar()
+    if counter_filters is not None:
+        scope_count = task_count(counter_filters)
+    else:
+        scope_count = db.session.query(db.func.count(Task.id)).filter(*filters).scalar()
+    etag = resource_etag(last_modified, scope_count)
+    if not_modified(etag, last_modified, dated=not filters):
+        return not_modified_response(etag, last_modified)
+
+    # Only the requested columns are selected, and the assignee join and
+    # aggregate subqueries are only added when their fields are asked for.
+    # Whatever the projection, the listing stays a single statement.
+    columns = {'id': Task.id}
+    if order_by != 'id':
+        columns[order_by] = getattr(Task, order_by)
+    for f in fields:
+        if f not in ('assignee_name', 'comment_count', 'time_spent'):
+            columns[f] = getattr(Task, f)
+
+    # The aggregates are correlated subqueries so they only touch the
+    # comments and time entries of the tasks being returned, through the
+    # task_id indexes, instead of grouping both tables in full
+    if 'assignee_name' in fields:
+        columns['assignee_name'] = User.name
+    if 'comment_count' in fields:
+        columns['comment_count'] = db.select(db.func.count(TaskComment.id)) \
+            .where(TaskComment.task_id == Task.id).scalar_subquery()
+    if 'time_spent' in fields:
+        columns['time_spent'] = db.select(db.func.coalesce(db.func.sum(TimeEntry.duration), 0)) \
+            .where(TimeEntry.task_id == Task.id).scalar_subquery()
+
+    query = db.session.query(*[c.label(name) for name, c in columns.items()]).select_from(Task)
+    if 'assignee_name' in fields:
+        query = query.outerjoin(User, Task.assignee_id == User.id)
+
+    query = query.filter(*filters)
+
+    keys = [(getattr(Task, order_by), order_by)] if order_by != 'id' else []
+    keys.append((Task.id, 'id'))
+    rows, next_cursor = paginate_keyset(query, keys)
+
+    response = list_response(rows, task_serializer(tuple(fields)), next_cursor)
+    return with_validators(response, etag, last_modified)
+
+@api.route('/api/tasks', methods=['POST'])
+def create_task():
+    data = request.get_json()
+    
+    task = Task(
+        title=data['title'],
+        description=data.get('description', ''),
+        status=data.get('status', 'todo'),
+        priority=data.get('priority', 'medium'),
+        project_id=data['project_id'],
+        assignee_id=data.get('assignee_id'),
+        created_by=1, # Dummy creator for now
+        due_date=datetime.fromisoformat(data['due_date']) if data.get('due_date') else None
+    )
+    
+    db.session.add(task)
+    db.session.flush()
+    
+    payload = {'task': task_serializer(TASK_EVENT_FIELDS)(task)}
+    broadcast_after_commit('task_created', payload, project_room(task.project_id))
+    if task.assignee_id:
+        broadcast_after_commit('task_assigned', payload, user_room(task.assignee_id))
+    # Serialized before the commit expires the task, saving a reload
+    response = task_serializer(TASK_CREATED_FIELDS)(task)
+    db.session.commit()
+    
+    return jsonify(response)
+
+TASK_UPDATE_COLUMNS = ('title', 'description', 'status', 'priority', 'assignee_id')
+
+def expected_task_version(data):
+    """The task version an update is based on: the If-Match ETag, else the
+    body's version. None when the client sent neither (or If-Match: *) and
+    the update applies to whatever is current. A weak or multi-valued
+    If-Match is rejected rather than ignored, so a conditional update never
+    silently becomes an unconditional one."""
+    if_match = request.if_match
+    if if_match.star_tag:
+        return None
+    if 'If-Match' in request.headers:
+        tags = if_match.as_set(include_weak=True)
+        if len(tags) != 1 or not if_match.as_set():
+            raise ApiError('If-Match must be the single strong ETag of the task, e.g. "3"')
+        version = next(iter(tags))
+    else:
+        version = data.get('version')
+    if version is None:
+        return None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise ApiError(f'Invalid task version: {version}')
+
+def task_update_statement(task_id, values, expected):
+    """One UPDATE of the task, conditional on ``expected`` when given, that
+    bumps the version and returns the new row along with the status and
+    assignee it replaced, or None when there is nothing to update. Postgres
+    reads those from a locked copy of the row in the same statement; SQLite
+    cannot return a joined table's columns, so they are read first, with the
+    write lock already held (see write_task_update) so the row cannot change
+    before the UPDATE."""
+    table = Task.__table__
+    returned = [table.c[name] for name in TASK_UPDATED_FIELDS]
+    statement = table.update().values(version=table.c.version + 1, **values)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        old = db.select(table.c.id, table.c.status, table.c.assignee_id, table.c.version) \
+            .where(table.c.id == task_id).with_for_update().subquery('old')
+        statement = statement.where(table.c.id == old.c.id).returning(
+            old.c.status.label('old_status'), old.c.assignee_id.label('old_assignee_id'), *returned)
+        if expected is not None:
+            statement = statement.where(old.c.version == expected)
+        return statement
+    old = db.session.execute(db.select(table.c.status, table.c.assignee_id, table.c.version)
+                             .where(table.c.id == task_id)).first()
+    if old is None or expected not in (None, old.version):
+        return None
+    return statement.where(table.c.id == task_id, table.c.version == old.version).returning(
+        db.literal(old.status).label('old_status'), db.literal(old.assignee_id).label('old_assignee_id'),
+        *returned)
+
+def status_change_rank(task_id, status):
+    """The rank for an update setting ``status``: last in that column of the
+    task's project, like a new task, unless the task is already there."""
+    project_id = db.session.query(Task.project_id).filter(Task.id == task_id).scalar()
+    last = column_rank(project_id, status, task_id, None, True)
+    table = Task.__table__
+    # Decided by the UPDATE itself, so a task moved there meanwhile keeps
+    # its place
+    return db.case((table.c.status == status, table.c.rank), else_=ranks_after(last)[0])
+
+def write_task_update(task_id, values, expected):
+    """Apply ``values`` to a task with task_update_statement and return the
+    response: the updated task with its version as the ETag, a 409 with its
+    current state when ``expected`` is out of date, or a 404."""
+    # On SQLite the old row and the column's last rank are read before the
+    # UPDATE, so nothing may write in between: an update without a version
+    # would otherwise get a 409 for a change it never asked to check
+    begin_write(db.session)
+    values['updated_at'] = datetime.utcnow()
+    if 'status' in values and 'rank' not in values:
+        values['rank'] = status_change_rank(task_id, values['status'])
+    statement = task_update_statement(task_id, values, expected)
+    task = db.session.execute(statement).first() if statement is not None else None
+    if task is None:
+        current = db.session.execute(db.select(*[getattr(Task, name) for name in TASK_UPDATED_FIELDS])
+                                     .where(Task.id == task_id)).first()
+        if current is None:
+            return jsonify({'error': 'Task not found'}), 404
+        return jsonify({'error': 'Task was changed by someone else',
+                        'task': task_serializer(TASK_UPDATED_FIELDS)(current)}), 409
+
+    # A Core UPDATE skips the session's flush hooks, so the counters, change
+    # log and search index are kept up to date here, as the bulk update does
+    connection = db.session.connection()
+    if task.status != task.old_status:
+        adjust_task_counts(connection, {(task.project_id, task.old_status): -1, (task.project_id, task.status): 1})
+    record_changes(connection, [('task', task_id, 'upsert')])
+    if 'title' in values or 'description' in values:
+        refresh_search_index(connection, [task_id])
+
+    payload = {'task': task_serializer(TASK_EVENT_FIELDS)(task)}
+    queue_task_update_after_commit(payload['task'])
+    if task.assignee_id and task.assignee_id != task.old_assignee_id:
+        broadcast_after_commit('task_assigned', payload, user_room(task.assignee_id))
+    if task.rank and needs_rebalance(task.rank):
+        enqueue('rebalance_ranks', {'project_id': task.project_id, 'status': task.status})
+    response = jsonify(task_serializer(TASK_UPDATED_FIELDS)(task))
+    response.set_etag(str(task.version))
+    db.session.commit()
+    
+    return response
+
+@api.route('/api/tasks/<int:task_id>', methods=['PUT'])
+def update_task(task_id):
+    """Update a task with a single conditional UPDATE instead of loading it
+    first. A task changed since the version in If-Match (or the body) gets a
+    409 with its current state; the new version comes back as the ETag."""
+    data = request.get_json()
+    if not isinstance(data, dict):
+        raise ApiError('expected an object')
+    expected = expected_task_version(data)
+    item = {name: data[name] for name in (*TASK_UPDATE_COLUMNS, 'due_date') if name in data}
+    try:
+        values = clean_task_values(item, set(), existing_ids(User.id, [item.get('assignee_id')]),
+                                   creating=False)
+    except ValueError as e:
+        raise ApiError(str(e))
+    return write_task_update(task_id, values, expected)
+
+def column_rank(project_id, status, task_id, bound, above):
+    """The rank of the nearest task above (or below) ``bound`` in a column,
+    leaving out the task being moved; None at the column's end."""
+    rank = Task.rank
+    query = db.session.query(db.func.max(rank) if above else db.func.min(rank)).filter(
+        Task.project_id == project_id, Task.status == status, Task.id != task_id)
+    if bound is not None:
+        query = query.filter(rank < bound if above else rank > bound)
+    return query.scalar()
+
+@api.route('/api/tasks/<int:task_id>/move', methods=['POST'])
+def move_task(task_id):
+    """Move a task within its project's board: into ``status`` (its current
+    column by default), right after task ``after_id`` or right before task
+    ``before_id``, or last when neither is given. Only the moved task's rank
+    is rewritten. Takes If-Match like PUT."""
+    data = request.get_json(silent=True) or {}
+    expected = expected_task_version(data)
+    neighbour_ids = {}
+    for name in ('after_id', 'before_id'):
+        if data.get(name) is not None:
+            if not isinstance(data[name], int) or data[name] == task_id:
+                raise ApiError(f'{name} must be another task in the target column')
+            neighbour_ids[name] = data[name]
+    # The moved task is locked for update from the start and its neighbours
+    # for share, so a rebalance cannot re-space the column in between. Rows
+    # are locked one at a time in id order, as rebalances do, so concurrent
+    # moves queue up instead of deadlocking. SQLite takes its write lock
+    # instead
+    begin_write(db.session)
+    rows = {}
+    for row_id in sorted({task_id, *neighbour_ids.values()}):
+        row = db.session.execute(
+            db.select(Task.id, Task.project_id, Task.status, Task.rank).where(Task.id == row_id)
+            .with_for_update(read=row_id != task_id)).first()
+        if row is not None:
+            rows[row_id] = row
+    task = rows.get(task_id)
+    if task is None:
+        return jsonify({'error': 'Task not found'}), 404
+    status = data.get('status', task.status)
+    if status not in TASK_STATUSES:
+        raise ApiError(f'Unknown status: {status}')
+    neighbours = {}
+    for name, neighbour_id in neighbour_ids.items():
+        neighbour = rows.get(neighbour_id)
+        if neighbour is None or (neighbour.project_id, neighbour.status) != (task.project_id, status):
+            raise ApiError(f'{name} must be another task in the target column')
+        neighbours[name] = neighbour.rank
+
+    if not neighbours:
+        rank = ranks_after(column_rank(task.project_id, status, task_id, None, True))[0]
+    else:
+        low = neighbours['after_id'] if 'after_id' in neighbours else \
+            column_rank(task.project_id, status, task_id, neighbours['before_id'], True)
+        high = neighbours['before_id'] if 'before_id' in neighbours else \
+            column_rank(task.project_id, status, task_id, neighbours['after_id'], False)
+        if low is not None and high is not None and low > high:
+            raise ApiError('after_id must come before before_id in the column')
+        if low is not None and low == high:
+            # Equal ranks left by concurrent moves; re-spacing the column
+            # settles them, after which the move can be sent again
+            enqueue('rebalance_ranks', {'project_id': task.project_id, 'status': status})
+            db.session.commit()
+            raise ApiError('The neighbours share a rank; the column is being re-spaced, try again', 409)
+        rank = ranks_between(low, high)[0]
+    return write_task_update(task_id, {'status': status, 'rank': rank}, expected)
+
+def run_rank_rebalance(payload):
+    project_id, status = payload['project_id'], payload['status']
+    # SQLite ignores the rebalance's FOR UPDATE, so a move committed between
+    # its read and its writes would be undone
+    begin_write(db.session)
+    ranks = rebalance_column(db.session.connection(), project_id, status)
+    record_changes(db.session.connection(), [('task', task_id, 'upsert') for task_id, _ in ranks])
+    broadcast_after_commit('tasks_reranked', {
+        'project_id': project_id,
+        'status': status,
+        'tasks': [{'id': task_id, 'rank': rank} for task_id, rank in ranks]
+    }, project_room(project_id))
+    db.session.commit()
+
+TASK_JOBS = {
+    'rebalance_ranks': run_rank_rebalance
+}
+
+# Bulk task routes
+BULK_MAX_ITEMS = 1000
+
+def bulk_items():
+    data = request.get_json(silent=True)
+    items = data.get('tasks') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ApiError('Expected a JSON body of the form {"tasks": [...]}')
+    if len(items) > BULK_MAX_ITEMS:
+        raise ApiError(f'At most {BULK_MAX_ITEMS} tasks per request')
+    return items
+
+def existing_ids(column, ids):
+    ids = {i for i in ids if isinstance(i, int)}
+    if not ids:
+        return set()
+    return {row[0] for row in db.session.query(column).filter(column.in_(ids))}
+
+def clean_task_values(item, project_ids, user_ids, creating):
+    """Validated column values for a bulk item or a PUT body. Raises
+    ValueError with the reason when the item is rejected."""
+    if not isinstance(item, dict):
+        raise ValueError('expected an object')
+    values = {}
+    if creating or 'title' in item:
+        if not isinstance(item.get('title'), str) or not item['title'].strip():
+            raise ValueError('title is required')
+        values['title'] = item['title']
+    if creating or 'description' in item:
+        values['description'] = item.get('description') or ''
+    for name, allowed, default in (('status', TASK_STATUSES, 'todo'),
+                                   ('priority', TASK_PRIORITIES, 'medium')):
+        if name in item:
+            if item[name] not in allowed:
+                raise ValueError(f'invalid {name}: {item[name]}')
+            values[name] = item[name]
+        elif creating:
+            values[name] = default
+    if creating or 'project_id' in item:
+        if item.get('project_id') not in project_ids:
+            raise ValueError(f"unknown project_id: {item.get('project_id')}")
+        values['project_id'] = item['project_id']
+    if creating or 'assignee_id' in item:
+        assignee_id = item.get('assignee_id')
+        if assignee_id is not None and assignee_id not in user_ids:
+            raise ValueError(f'unknown assignee_id: {assignee_id}')
+        values['assignee_id'] = assignee_id
+    if creating or 'due_date' in item:
+        try:
+            values['due_date'] = datetime.fromisoformat(item['due_date']) if item.get('due_date') else None
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid due_date: {item.get('due_date')}")
+    return values
+
+def task_event_payload(values):
+    return {f: values[f] for f in TASK_EVENT_FIELDS}
+
+def broadcast_task_batch(event_name, payloads):
+    rooms = {}
+    for payload in payloads:
+        rooms.setdefault(project_room(payload['project_id']), []).append(payload)
+    for room, tasks in rooms.items():
+        broadcast_after_commit(event_name, {'tasks': tasks}, room)
+
+def broadcast_assignments(assignments):
+    users = {}
+    for assignee_id, payload in assignments:
+        users.setdefault(assignee_id, []).append(payload)
+    for assignee_id, tasks in users.items():
+        broadcast_after_commit('tasks_assigned', {'tasks': tasks}, user_room(assignee_id))
+
+@api.route('/api/tasks/bulk', methods=['POST'])
+def create_tasks_bulk():
+    items = bulk_items()
+    dicts = [item for item in items if isinstance(item, dict)]
+    project_ids = existing_ids(Project.id, (i.get('project_id') for i in dicts))
+    user_ids = existing_ids(User.id, (i.get('assignee_id') for i in dicts))
+
+    results = [None] * len(items)
+    rows, indexes = [], []
+    for index, item in enumerate(items):
+        try:
+            values = clean_task_values(item, project_ids, user_ids, creating=True)
+        except ValueError as e:
+            results[index] = {'index': index, 'error': str(e)}
+            continue
+        values['created_by'] = 1 # Dummy creator for now
+        rows.append(values)
+        indexes.append(index)
+
+    # One executemany INSERT for the whole batch, one commit. Postgres sends
+    # it as batched multi-row VALUES; SQLite cannot promise RETURNING order,
+    # so SQLAlchemy runs it row by row there, still inside one transaction
+    if rows:
+        table = Task.__table__
+        assign_ranks(db.session.connection(), rows, 'todo')
+        inserted = db.session.execute(
+            table.insert().returning(table.c.id, table.c.version, sort_by_parameter_order=True), rows
+        ).all()
+        deltas = {}
+        for (task_id, version), values, index in zip(inserted, rows, indexes):
+            values['id'] = task_id
+            values['version'] = version
+            key = (values['project_id'], values['status'])
+            deltas[key] = deltas.get(key, 0) + 1
+            results[index] = {'index': index, 'id': task_id}
+        adjust_task_counts(db.session.connection(), deltas)
+        task_ids = [values['id'] for values in rows]
+        record_changes(db.session.connection(), [('task', task_id, 'upsert') for task_id in task_ids])
+        refresh_search_index(db.session.connection(), task_ids)
+
+        payloads = [task_event_payload(values) for values in rows]
+        broadcast_task_batch('tasks_created', payloads)
+        broadcast_assignments([(values['assignee_id'], payload)
+                               for values, payload in zip(rows, payloads)
+                               if values['assignee_id']])
+        db.session.commit()
+
+    return jsonify({'created': len(rows), 'results': results})
+
+@api.route('/api/tasks/bulk', methods=['PATCH'])
+def update_tasks_bulk():
+    items = bulk_items()
+    dicts = [item for item in items if isinstance(item, dict)]
+    # The rows are locked before their old values are read, so the counter,
+    # flow and rollup deltas built from them hold until commit
+    begin_write(db.session)
+    current = {row.id: row for row in db.session.query(
+        Task.id, Task.title, Task.status, Task.project_id, Task.assignee_id
+    ).filter(Task.id.in_({i.get('id') for i in dicts if isinstance(i.get('id'), int)}))
+        .order_by(Task.id).with_for_update()}
+    project_ids = existing_ids(Project.id, (i.get('project_id') for i in dicts))
+    user_ids = existing_ids(User.id, (i.get('assignee_id') for i in dicts))
+
+    now = datetime.utcnow()
+    results = [None] * len(items)
+    updates = []
+    seen = set()
+    for index, item in enumerate(items):
+        try:
+            task_id = item.get('id') if isinstance(item, dict) else None
+            if task_id not in current:
+                raise ValueError(f'unknown task id: {task_id}')
+            if task_id in seen:
+                raise ValueError(f'duplicate task id: {task_id}')
+            seen.add(task_id)
+            values = clean_task_values(item, project_ids, user_ids, creating=False)
+        except ValueError as e:
+            results[index] = {'index': index, 'error': str(e)}
+            continue
+        values['updated_at'] = now
+        updates.append((index, current[task_id], values))
+        results[index] = {'index': index, 'id': task_id}
+
+    if updates:
+        # Tasks changing column go last in the new one, in item order
+        moved = []
+        for _, old, values in updates:
+            column = (values.get('project_id', old.project_id), values.get('status', old.status))
+            if column != (old.project_id, old.status):
+                moved.append((values, {'project_id': column[0], 'status': column[1], 'rank': None}))
+        assign_ranks(db.session.connection(), [row for _, row in moved], 'todo')
+        for values, row in moved:
+            values['rank'] = row['rank']
+
+        # Items that set the same columns share one executemany UPDATE
+        groups = {}
+        deltas = {}
+        for index, old, values in updates:
+            groups.setdefault(tuple(sorted(values)), []).append(dict(values, _id=old.id))
+            new_project = values.get('project_id', old.project_id)
+            new_status = values.get('status', old.status)
+            if (new_project, new_status) != (old.project_id, old.status):
+                deltas[(old.project_id, old.status)] = deltas.get((old.project_id, old.status), 0) - 1
+                deltas[(new_project, new_status)] = deltas.get((new_project, new_status), 0) + 1
+        table = Task.__table__
+        statement = table.update().where(table.c.id == db.bindparam('_id')).values(version=table.c.version + 1)
+        for rows in groups.values():
+            db.session.execute(statement, rows)
+        # Bulk updates are not conditional, so the versions they leave are
+        # read back for the events, with the ranks
+        written = {row.id: row for row in db.session.execute(
+            db.select(table.c.id, table.c.version, table.c.rank)
+            .where(table.c.id.in_([old.id for _, old, _ in updates])))}
+        adjust_task_counts(db.session.connection(), deltas)
+        move_task_time(db.session.connection(), {
+            old.id: (old.project_id, values['project_id']) for _, old, values in updates
+            if values.get('project_id', old.project_id) != old.project_id
+        })
+        record_changes(db.session.connection(), [('task', old.id, 'upsert') for _, old, _ in updates])
+        refresh_search_index(db.session.connection(), [old.id for _, old, values in updates
+                                                       if 'title' in values or 'description' in values])
+
+        room_updates = []
+        assignments = []
+        for index, old, values in updates:
+            payload = task_event_payload({
+                'id': old.id,
+                'title': values.get('title', old.title),
+                'status': values.get('status', old.status),
+                'project_id': values.get('project_id', old.project_id),
+                'version': written[old.id].version,
+                'rank': written[old.id].rank
+            })
+            for project_id in {old.project_id, payload['project_id']}:
+                room_updates.append((project_room(project_id), old.id, payload))
+            assignee_id = values.get('assignee_id', old.assignee_id)
+            if assignee_id and assignee_id != old.assignee_id:
+                assignments.append((assignee_id, payload))
+        flush_task_updates_after_commit(room_updates)
+        broadcast_assignments(assignments)
+        db.session.commit()
+
+    return jsonify({'updated': len(updates), 'results': results})
+
+# Bulk import
+IMPORT_CHUNK_SIZE = 5000
+USER_ROLES = ('admin', 'user')
+
+def import_value(record, name):
+    # CSV cells are always strings, with '' for empty ones
+    value = record.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value == '' else value
+
+def import_int(record, name):
+    value = import_value(record, name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'invalid {name}: {value}')
+
+def import_datetime(record, name):
+    value = import_value(record, name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'invalid {name}: {value}')
+
+def import_choice(record, name, allowed, default):
+    value = import_value(record, name) or default
+    if value not in allowed:
+        raise ValueError(f'invalid {name}: {value}')
+    return value
+
+class ImportLookups:
+    """Foreign key maps loaded once per import, so references by email or
+    name resolve without a query per row. Project names shared by several
+    projects map to None and are rejected as ambiguous."""
+
+    def __init__(self):
+        self.users_by_email = {email.lower(): user_id for user_id, email
+                               in db.session.query(User.id, User.email)}
+        self.user_ids = set(self.users_by_email.values())
+        self.projects_by_name = {}
+        self.project_ids = set()
+        for project_id, name in db.session.query(Project.id, Project.name):
+            self.project_ids.add(project_id)
+            self.projects_by_name[name] = None if name in self.projects_by_name else project_id
+        self.task_ids = set()
+
+    def user(self, record, id_field, email_field):
+        user_id = import_int(record, id_field)
+        email = import_value(record, email_field)
+        if user_id is None and email is not None:
+            user_id = self.users_by_email.get(email.lower())
+            if user_id is None:
+                raise ValueError(f'unknown user: {email}')
+        elif user_id is not None and user_id not in self.user_ids:
+            raise ValueError(f'unknown {id_field}: {user_id}')
+        return user_id
+
+    def project(self, record):
+        project_id = import_int(record, 'project_id')
+        name = import_value(record, 'project')
+        if project_id is None and name is not None:
+            if name not in self.projects_by_name:
+                raise ValueError(f'unknown project: {name}')
+            project_id = self.projects_by_name[name]
+            if project_id is None:
+                raise ValueError(f'ambiguous project name: {name}')
+        elif project_id is None:
+            raise ValueError('project_id or project is required')
+        elif project_id not in self.project_ids:
+            raise ValueError(f'unknown project_id: {project_id}')
+        return project_id
+
+def clean_import_user(record, lookups):
+    name = import_value(record, 'name')
+    email = import_value(record, 'email')
+    if not name or not email:
+        raise ValueError('name and email are required')
+    if email.lower() in lookups.users_by_email:
+        raise ValueError(f'duplicate email: {email}')
+    values = {
+        'name': name,
+        'email': email,
+        'password': import_value(record, 'password') or '',
+        'role': import_choice(record, 'role', USER_ROLES, 'user'),
+        'created_at': import_datetime(record, 'created_at') or datetime.utcnow()
+    }
+    # Reserved so a repeat later in the file is rejected too
+    lookups.users_by_email[email.lower()] = None
+    return values
+
+def clean_import_task(record, lookups):
+    title = import_value(record, 'title')
+    if not title:
+        raise ValueError('title is required')
+    created_at = import_datetime(record, 'created_at') or datetime.utcnow()
+    return {
+        'title': title,
+        'description': import_value(record, 'description') or '',
+        'status': import_choice(record, 'status', TASK_STATUSES, 'todo'),
+        'priority': import_choice(record, 'priority', TASK_PRIORITIES, 'medium'),
+        'project_id': lookups.project(record),
+        'assignee_id': lookups.user(record, 'assignee_id', 'assignee'),
+        'created_by': lookups.user(record, 'created_by', 'creator') or 1, # Dummy creator for now
+        'due_date': import_datetime(record, 'due_date'),
+        'created_at': created_at,
+        'updated_at': import_datetime(record, 'updated_at') or created_at
+    }
+
+def clean_import_time_entry(record, lookups):
+    task_id = import_int(record, 'task_id')
+    if task_id not in lookups.task_ids:
+        raise ValueError(f'unknown task_id: {task_id}')
+    user_id = lookups.user(record, 'user_id', 'user')
+    if user_id is None:
+        raise ValueError('user_id or user is required')
+    start_time = import_datetime(record, 'start_time')
+    if start_time is None:
+        raise ValueError('start_time is required')
+    end_time = import_datetime(record, 'end_time')
+    if end_time is not None and end_time < start_time:
+        raise ValueError('end_time is before start_time')
+    duration = import_int(record, 'duration')
+    if duration is None and end_time is not None:
+        duration = int((end_time - start_time).total_seconds() // 60)
+    return {
+        'task_id': task_id,
+        'user_id': user_id,
+        'description': import_value(record, 'description') or '',
+        'start_time': start_time,
+        'end_time': end_time,
+        'duration': duration,
+        'created_at': import_datetime(record, 'created_at') or datetime.utcnow()
+    }
+
+def load_chunk_task_ids(chunk, lookups):
+    # Tasks can number in the millions, so only the ids a chunk refers to
+    # are checked, with one query per chunk
+    ids = set()
+    for _, record in chunk:
+        try:
+            ids.add(import_int(record, 'task_id'))
+        except ValueError:
+            pass
+    lookups.task_ids = existing_ids(Task.id, ids)
+
+def write_import_users(rows):
+    db.session.execute(User.__table__.insert(), rows)
+    db.session.commit()
+
+def write_import_tasks(rows):
+    # Core executemany: the ORM flush hooks do not run, so the counters and
+    # the change log are updated here, in the same transaction
+    table = Task.__table__
+    assign_ranks(db.session.connection(), rows, 'todo')
+    task_ids = db.session.execute(table.insert().returning(table.c.id), rows).scalars().all()
+    adjust_task_counts(db.session.connection(),
+                       Counter((row['project_id'], row['status']) for row in rows))
+    record_changes(db.session.connection(), [('task', task_id, 'upsert') for task_id in task_ids])
+    refresh_search_index(db.session.connection(), task_ids)
+    db.session.commit()
+
+def write_import_time_entries(rows):
+    table = TimeEntry.__table__
+    entry_ids = db.session.execute(table.insert().returning(table.c.id), rows).scalars().all()
+    # Same bookkeeping as touch_parent_tasks and track_time_rollups
+    task_ids = {row['task_id'] for row in rows}
+    tasks = Task.__table__
+    db.session.execute(tasks.update().where(tasks.c.id.in_(task_ids))
+                       .values(updated_at=datetime.utcnow()))
+    projects = dict(db.session.query(Task.id, Task.project_id).filter(Task.id.in_(task_ids)))
+    adjust_time_rollups(db.session.connection(), [
+        (projects[row['task_id']], row['user_id'], row['start_time'], row['duration'], 1) for row in rows])
+    record_changes(db.session.connection(),
+                   [('time_entry', entry_id, 'upsert') for entry_id in entry_ids] +
+                   [('task', task_id, 'upsert') for task_id in task_ids])
+    db.session.commit()
+
+# entity: (clean one record, per-chunk preparation, write one chunk)
+IMPORT_ENTITIES = {
+    'users': (clean_import_user, None, write_import_users),
+    'tasks': (clean_import_task, None, write_import_tasks),
+    'time_entries': (clean_import_time_entry, load_chunk_task_ids, write_import_time_entries)
+}
+
+def import_records(entity, records, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Import ``(line, record)`` pairs as ``entity`` rows, one transaction
+    per chunk. Rejected rows are reported and skipped. Returns ImportStats."""
+    clean, prepare, write = IMPORT_ENTITIES[entity]
+    lookups = ImportLookups()
+
+    def validate(chunk):
+        if prepare:
+            prepare(chunk, lookups)
+        rows, rejected = [], []
+        for line, record in chunk:
+            try:
+                rows.append(clean(record, lookups))
+            except ValueError as e:
+                rejected.append((line, str(e)))
+        return rows, rejected
+
+    return run_import(records, validate, write, chunk_size, progress)
+
+@api.route('/api/import/<entity>', methods=['POST'])
+def import_data(entity):
+    """Import a CSV or NDJSON file, sent as the ``file`` field of a form or
+    as the raw body. The format comes from ``format``, else the file name."""
+    user_id = 1 # Dummy user for now
+    user = User.query.get(user_id)
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Admin only'}), 403
+    if entity not in IMPORT_ENTITIES:
+        return jsonify({'error': f'Cannot import {entity}'}), 404
+
+    upload = request.files.get('file')
+    filename = upload.filename if upload else ''
+    fmt = request.args.get('format') or filename.rsplit('.', 1)[-1].lower()
+    if fmt not in IMPORT_FORMATS:
+        raise ApiError(f"Unknown import format: {fmt or 'none given'}")
+
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream,
+                              encoding='utf-8-sig', newline='')
+    stats = import_records(entity, read_records(stream, fmt))
+    return jsonify(stats.to_dict())
+
+# User routes
+USER_FIELDS = ('id', 'name', 'email', 'role')
+USER_EXTRA_FIELDS = ('created_at',)
+
+@api.route('/api/users', methods=['GET'])
+@cached('user')
+def get_users():
+    fields = parse_fields(USER_FIELDS + USER_EXTRA_FIELDS, USER_FIELDS)
+    role = request.args.get('role')
+
+    query = User.query
+    if role:
+        query = query.filter(User.role == role)
+
+    users, next_cursor = paginate_keyset(query, [(User.id, 'id')])
+    return list_response(users, user_serializer(tuple(fields)), next_cursor)
+
+# Search
+SEARCH_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'project_id', 'assignee_id',
+                 'due_date', 'created_at', 'updated_at', 'score')
+SEARCH_DEFAULT_FIELDS = ('id', 'title', 'status', 'priority', 'project_id', 'assignee_id', 'score')
+SEARCH_PAGE_SIZE = 20
+# Only the newest matches are ranked: scoring every task that contains a
+# common word costs a second or more on a million tasks, while a window of
+# recent matches is scored in the same pass that finds them
+SEARCH_RANK_WINDOW = 1000
+
+@api.route('/api/search', methods=['GET'])
+def search_tasks():
+    """Tasks whose title, description or comments contain every word of
+    ``q``, the last word also as a prefix. Matches are ranked best first in
+    windows of SEARCH_RANK_WINDOW, newest window first; the cursor moves on
+    to the next older window once one is used up, so a window's last page
+    can be short. Filtered by ``project_id`` and ``status``; paged by
+    ``limit`` and ``cursor``."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        raise ApiError('q is required')
+    fields = parse_fields(SEARCH_FIELDS, SEARCH_DEFAULT_FIELDS)
+    project_id = request.args.get('project_id', type=int)
+    status = request.args.get('status')
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+    serialize = task_serializer(tuple(fields))
+    terms = search_terms(q)
+    if not terms:
+        return list_response([], serialize, None)
+
+    # Results are ranked, not ordered by a column, so the cursor is an
+    # offset into the window plus the window's newest key, which also keeps
+    # tasks created while paging from shifting it
+    cursor = request.args.get('cursor')
+    if cursor:
+        offset, newest = decode_cursor(cursor, [Task.id, Task.id])
+        if not isinstance(offset, int) or not isinstance(newest, int) or offset < 0:
+            raise ApiError('Invalid cursor')
+    else:
+        offset = 0
+        newest = db.session.query(db.func.max(Task.id)).scalar() or 0
+
+    join_index, matches, score, key = search_clauses(db.engine.dialect.name, Task.id, terms,
+                                                     (Task.title, Task.description))
+    columns = [getattr(Task, f) for f in dict.fromkeys(['id'] + fields) if f != 'score']
+    window = join_index(db.select(*columns, score.label('score')).select_from(Task)) \
+        .where(matches, key <= newest)
+    if project_id:
+        window = window.where(Task.project_id == project_id)
+    if status:
+        window = window.where(Task.status == status)
+    window = window.order_by(key.desc()).limit(SEARCH_RANK_WINDOW).subquery()
+
+    statement = db.select(*[window.c[f] for f in fields],
+                          db.func.count().over().label('window_size'),
+                          db.func.min(window.c.id).over().label('window_oldest')) \
+        .order_by(window.c.score.desc(), window.c.id).offset(offset).limit(limit + 1)
+    rows = db.session.execute(statement).all()
+    if len(rows) > limit:
+        next_cursor = encode_cursor([offset + limit, newest])
+    elif rows and rows[0].window_size == SEARCH_RANK_WINDOW:
+        # A full window may have older matches behind it
+        next_cursor = encode_cursor([0, rows[0].window_oldest - 1])
+    else:
+        next_cursor = None
+    return list_response(rows[:limit], serialize, next_cursor)
+
+# Delta sync
+SYNC_PAGE_SIZE = 1000
+SYNC_SERIALIZERS = {
+    'tasks': task_serializer,
+    'projects': project_serializer,
+    'members': member_serializer,
+    'comments': comment_serializer,
+    'time_entries': time_entry_serializer
+}
+
+@api.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """Everything created, updated or deleted after the ``since`` cursor.
+
+    Without ``since`` only the current cursor is returned: take it before a
+    full load, then poll with it. Entities touched several times are sent
+    once in their current state, or listed under ``deleted`` when gone.
+    ``reset`` asks the client to reload: the cursor predates the reset
+    marker that restarts the log after a reseed, or the log is behind it."""
+    since = request.args.get('since', type=int)
+    latest = db.session.query(db.func.max(ChangeLog.id)).scalar() or 0
+    if since is None:
+        return jsonify({'cursor': latest})
+    first = db.session.query(ChangeLog.id, ChangeLog.operation).filter(
+        ChangeLog.id == db.session.query(db.func.min(ChangeLog.id)).scalar_subquery()).first()
+    if since > latest or (first is not None and first.operation == RESET and since < first.id):
+        return jsonify({'cursor': latest, 'reset': True})
+
+    changes = db.session.query(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id) \
+        .filter(ChangeLog.id > since).order_by(ChangeLog.id).limit(SYNC_PAGE_SIZE + 1).all()
+    has_more = len(changes) > SYNC_PAGE_SIZE
+    changes = changes[:SYNC_PAGE_SIZE]
+
+    touched = {key: set() for key in SYNC_ENTITIES}
+    for change in changes:
+        touched[SYNC_KEYS[change.entity]].add(change.entity_id)
+
+    result = {
+        'cursor': changes[-1].id if changes else since,
+        'has_more': has_more,
+        'deleted': {}
+    }
+    for key, model in SYNC_ENTITIES.items():
+        ids = touched[key]
+        rows = model.query.filter(model.id.in_(ids)).all() if ids else []
+        columns = tuple(attr.key for attr in model.__mapper__.column_attrs)
+        result[key] = SYNC_SERIALIZERS[key](columns).many(rows)
+        result['deleted'][key] = sorted(ids - {row.id for row in rows})
+    return jsonify(result)
+
+# Exports
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+TASK_EXPORT_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'project_id',
+                      'assignee_id', 'created_by', 'due_date', 'created_at', 'updated_at')
+TIME_ENTRY_EXPORT_FIELDS = ('id', 'task_id', 'project_id', 'user_id', 'description',
+                            'start_time', 'end_time', 'duration', 'created_at')
+
+def iter_export(statement, serialize, export_format):
+    """Encode the rows of ``statement`` one batch at a time. The rows are
+    read through a server-side cursor (``yield_per``), so memory holds one
+    batch whatever the size of the export."""
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(serialize.names)
+        for rows in result.partitions():
+            writer.writerows(serialize(row).values() for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        dumps = current_app.json.dumps
+        for rows in result.partitions():
+            yield ''.join(dumps(item) + '\n' for item in serialize.many(rows))
+
+def export_response(name, statement, serialize):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise ApiError(f'Unknown export format: {export_format}')
+    body = iter_export(statement, serialize, export_format)
+    response = current_app.response_class(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{export_format}'
+    return response
+
+@api.route('/api/export/tasks', methods=['GET'])
+def export_tasks():
+    """Stream tasks as NDJSON or CSV, filtered by ``project_id`` and a
+    ``from``/``to`` range on created_at."""
+    fields = parse_fields(TASK_EXPORT_FIELDS, TASK_EXPORT_FIELDS)
+    project_id = request.args.get('project_id', type=int)
+    start = parse_datetime_arg('from')
+    end = parse_datetime_arg('to')
+
+    statement = db.select(*[getattr(Task, f) for f in fields])
+    if project_id:
+        statement = statement.where(Task.project_id == project_id)
+    if start:
+        statement = statement.where(Task.created_at >= start)
+    if end:
+        statement = statement.where(Task.created_at < end)
+    return export_response('tasks', statement.order_by(Task.id), task_serializer(tuple(fields)))
+
+@api.route('/api/export/time_entries', methods=['GET'])
+def export_time_entries():
+    """Stream time entries as NDJSON or CSV, filtered by ``project_id`` and
+    a ``from``/``to`` range on start_time."""
+    fields = parse_fields(TIME_ENTRY_EXPORT_FIELDS, TIME_ENTRY_EXPORT_FIELDS)
+    project_id = request.args.get('project_id', type=int)
+    start = parse_datetime_arg('from')
+    end = parse_datetime_arg('to')
+
+    columns = [Task.project_id if f == 'project_id' else getattr(TimeEntry, f) for f in fields]
+    statement = db.select(*columns).select_from(TimeEntry)
+    if project_id or 'project_id' in fields:
+        statement = statement.join(Task, TimeEntry.task_id == Task.id)
+    if project_id:
+        statement = statement.where(Task.project_id == project_id)
+    if start:
+        statement = statement.where(TimeEntry.start_time >= start)
+    if end:
+        statement = statement.where(TimeEntry.start_time < end)
+    return export_response('time_entries', statement.order_by(TimeEntry.id),
+                           time_entry_serializer(tuple(fields)))
+
+# Dashboard statistics
+@api.route('/api/dashboard/stats', methods=['GET'])
+def get_dashboard_stats():
+    user_id = 1 # Dummy user for now
+    user = User.query.get(user_id)
+    
+    # Totals come from the per-project counter table, so the cost depends on
+    # how many projects the user can see rather than how many tasks exist
+    counts = db.session.query(ProjectTaskCount.status, db.func.sum(ProjectTaskCount.count))
+    if user.role == 'admin':
+        total_projects = db.session.query(db.func.count(Project.id)).scalar()
+    else:
+        # Union rather than concatenation so a project the user both owns
+        # and is a member of is only counted once
+        project_ids = db.union(
+            db.select(ProjectMember.project_id).where(ProjectMember.user_id == user_id),
+            db.select(Project.id).where(Project.owner_id == user_id)
+        ).subquery()
+        total_projects = db.session.query(db.func.count()).select_from(project_ids).scalar()
+        counts = counts.filter(ProjectTaskCount.project_id.in_(db.select(project_ids.c[0])))
+
+    by_status = dict(counts.group_by(ProjectTaskCount.status).all())
+    total_tasks = sum(by_status.values())
+    completed_tasks = by_status.get('completed', 0)
+    pending_tasks = by_status.get('todo', 0)
+
+    return jsonify({
+        'total_projects': total_projects,
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks,
+        'pending_tasks': pending_tasks,
+        'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    })
+
+# Analytics
+# Reports read the rollup and task flow tables (rollups.py), so their cost
+# follows the number of periods shown rather than the entries behind them
+ANALYTICS_GROUPS = {'user': 'user_id', 'project': 'project_id'}
+DEFAULT_REPORT_DAYS = {'day': 30, 'week': 12 * 7, 'month': 365}
+MAX_REPORT_DAYS = 3660
+VELOCITY_WEEKS = 12
+
+def parse_report_range(period):
+    to = parse_datetime_arg('to')
+    end = to.date() if to else datetime.utcnow().date()
+    since = parse_datetime_arg('from')
+    start = since.date() if since else end - timedelta(days=DEFAULT_REPORT_DAYS[period])
+    start = period_start(period, start)
+    if start > end:
+        raise ApiError('from must not be after to')
+    if (end - start).days > MAX_REPORT_DAYS:
+        raise ApiError(f'Reports cover at most {MAX_REPORT_DAYS} days')
+    return start, end
+
+@api.route('/api/analytics/time', methods=['GET'])
+def get_time_report():
+    """Minutes logged and entries started per ``period`` (day, week or
+    month) from ``from`` to ``to``, in total or per ``group_by`` user or
+    project, filtered by ``project_id`` or ``user_id``. With ``task_id`` the
+    task's own entries are summed instead, as a task has few."""
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        raise ApiError(f"period must be one of: {', '.join(PERIODS)}")
+    group_by = request.args.get('group_by')
+    if group_by and group_by not in ANALYTICS_GROUPS:
+        raise ApiError(f"group_by must be one of: {', '.join(ANALYTICS_GROUPS)}")
+    key = ANALYTICS_GROUPS.get(group_by)
+    start, end = parse_report_range(period)
+    project_id = request.args.get('project_id', type=int)
+    user_id = request.args.get('user_id', type=int)
+    task_id = request.args.get('task_id', type=int)
+
+    if task_id:
+        task = db.session.get(Task, task_id)
+        if task is None:
+            return jsonify({'error': 'Task not found'}), 404
+        entries = db.session.query(TimeEntry.user_id, TimeEntry.start_time, TimeEntry.duration).filter(
+            TimeEntry.task_id == task_id,
+            TimeEntry.start_time >= datetime.combine(start, datetime.min.time()),
+            TimeEntry.start_time < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        if user_id:
+            entries = entries.filter(TimeEntry.user_id == user_id)
+        totals = {}
+        for entry_user_id, start_time, duration in entries:
+            group = {'user_id': entry_user_id, 'project_id': task.project_id}.get(key)
+            row = totals.setdefault((period_start(period, start_time.date()), group), [0, 0])
+            row[0] += duration or 0
+            row[1] += 1
+        rows = [(begins, group, minutes, count) for (begins, group), (minutes, count) in sorted(totals.items())]
+    else:
+        # Each period and key is one row; totals are the rows keyed ALL
+        query = db.session.query(TimeRollup.period_start, getattr(TimeRollup, key) if key else db.literal(None),
+                                 TimeRollup.minutes, TimeRollup.entries) \
+            .filter(TimeRollup.period == period, TimeRollup.period_start.between(start, end),
+                    TimeRollup.entries != 0)
+        for name, value in (('project_id', project_id), ('user_id', user_id)):
+            column = getattr(TimeRollup, name)
+            if value:
+                query = query.filter(column == value)
+            elif key == name:
+                query = query.filter(column != ALL)
+            else:
+                query = query.filter(column == ALL)
+        order = [TimeRollup.period_start] + ([getattr(TimeRollup, key)] if key else [])
+        rows = query.order_by(*order).all()
+
+    report = []
+    for begins, group, minutes, count in rows:
+        item = {'period_start': begins.isoformat(), 'minutes': minutes, 'entries': count}
+        if key:
+            item[key] = group
+        report.append(item)
+    return jsonify(report)
+
+def task_flow_by_day(project_id, start, end):
+    query = db.session.query(ProjectTaskFlow.day, ProjectTaskFlow.added, ProjectTaskFlow.completed) \
+        .filter(ProjectTaskFlow.project_id == (project_id or ALL), ProjectTaskFlow.day.between(start, end))
+    return {day: (added, completed) for day, added, completed in query}
+
+@api.route('/api/analytics/burndown', methods=['GET'])
+def get_burndown():
+    """Open tasks at the end of each day from ``from`` to ``to``, with the
+    tasks added and completed that day, for ``project_id`` or every
+    project."""
+    project_id = request.args.get('project_id', type=int)
+    start, end = parse_report_range('day')
+    remaining = db.session.query(
+        db.func.coalesce(db.func.sum(ProjectTaskFlow.added - ProjectTaskFlow.completed), 0)
+    ).filter(ProjectTaskFlow.project_id == (project_id or ALL), ProjectTaskFlow.day < start).scalar()
+    flow = task_flow_by_day(project_id, start, end)
+
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        added, completed = flow.get(day, (0, 0))
+        remaining += added - completed
+        days.append({'day': day.isoformat(), 'added': added, 'completed': completed, 'remaining': remaining})
+    return jsonify({'project_id': project_id, 'days': days})
+
+@api.route('/api/analytics/velocity', methods=['GET'])
+def get_velocity():
+    """Tasks completed and minutes logged in each of the last ``weeks``
+    weeks, for ``project_id`` or every project, with their averages."""
+    project_id = request.args.get('project_id', type=int)
+    weeks = max(1, min(request.args.get('weeks', VELOCITY_WEEKS, type=int), MAX_REPORT_DAYS // 7))
+    end = datetime.utcnow().date()
+    start = period_start('week', end) - timedelta(weeks=weeks - 1)
+
+    completed = {}
+    for day, (_, count) in task_flow_by_day(project_id, start, end).items():
+        week = period_start('week', day)
+        completed[week] = completed.get(week, 0) + count
+    minutes = dict(db.session.query(TimeRollup.period_start, TimeRollup.minutes).filter(
+        TimeRollup.period == 'week', TimeRollup.project_id == (project_id or ALL),
+        TimeRollup.user_id == ALL, TimeRollup.period_start >= start).all())
+
+    series = [{'week_start': week.isoformat(), 'completed': completed.get(week, 0), 'minutes': minutes.get(week, 0)}
+              for week in (start + timedelta(weeks=i) for i in range(weeks))]
+    return jsonify({
+        'project_id': project_id,
+        'weeks': series,
+        'average_completed': sum(w['completed'] for w in series) / weeks,
+        'average_minutes': sum(w['minutes'] for w in series) / weeks
+    })
+
+# Background jobs
+DEAD_JOBS_LIMIT = 50
+
+@api.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    store = jobs().store
+    counts = store.counts()
+    result = {'queued': counts.get('queued', 0), 'dead': counts.get('dead', 0)}
+    # Dead letters carry task data in their errors, so only admins see them
+    user = User.query.get(1) # Dummy user for now
+    if user and user.role == 'admin':
+        result['dead_letters'] = [dict(job, created_at=json_value(job['created_at']))
+                                  for job in store.dead(DEAD_JOBS_LIMIT)]
+    return jsonify(result)
+
+@api.route('/api/jobs/<int:job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    user = User.query.get(1) # Dummy user for now
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Admin only'}), 403
+    if not jobs().store.requeue(job_id):
+        return jsonify({'error': 'No dead job with that id'}), 404
+    jobs().wake()
+    return jsonify({'message': 'Job queued.'})
+
+@api.route('/api/realtime/stats', methods=['GET'])
+def get_realtime_stats():
+    return jsonify({
+        'emits': {event: count for (event,), count in realtime().emits.values().items()},
+        'deliveries': {event: count for (event,), count in realtime().deliveries.values().items()}
+    })
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return current_app.response_class(current_app.extensions['metrics'].render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api.route('/api/seed', methods=['POST'])
+def reseed_demo_data():
+    user_id = 1 # Dummy user for now
+    user = User.query.get(user_id)
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Admin only'}), 403
+    # Drop all data
+    meta = db.metadata
+    for table in reversed(meta.sorted_tables):
+        db.session.execute(table.delete())
+    refresh_search_index(db.session.connection())
+    # The deletes are not logged one by one; synced clients reload instead
+    record_reset(db.session.connection())
+    db.session.commit()
+    # Reseed
+    create_sample_data()
+    return jsonify({'message': 'Demo data reseeded.'})
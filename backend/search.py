@@ -0,0 +1,117 @@
+"""Full-text index over task titles, descriptions and comments.
+
+SQLite keeps one FTS5 row per task (rowid = task id, one column per
+field); Postgres keeps a weighted tsvector per task with a GIN index. Both
+tokenize without stemming. Every term but the last must match a whole word;
+the last one also matches as a prefix, so results keep up while a word is
+being typed. Other databases have no index and search falls back to LIKE.
+
+The index is not maintained by triggers: the task and comment write paths
+call refresh_search_index in their own transaction, the same way they
+update the task counters.
+"""
+import re
+
+from sqlalchemy import and_, bindparam, column, func, literal_column, or_, table, text
+
+SEARCH_TABLE = 'task_search'
+SEARCH_DIALECTS = ('sqlite', 'postgresql')
+MAX_TERMS = 10
+REFRESH_BATCH_SIZE = 500
+
+# Relative weight of a match in the title, description and comments
+SQLITE_WEIGHTS = (10.0, 4.0, 1.0)
+
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, description, comments, tokenize = 'unicode61', prefix = '2 3')",
+)
+POSTGRES_DDL = (
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+    "task_id INTEGER PRIMARY KEY REFERENCES task (id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+)
+
+SQLITE_DOCUMENTS = f"""
+INSERT INTO {SEARCH_TABLE} (rowid, title, description, comments)
+SELECT task.id, task.title, coalesce(task.description, ''),
+       coalesce((SELECT group_concat(content, ' ') FROM task_comment
+                 WHERE task_comment.task_id = task.id), '')
+FROM task
+"""
+POSTGRES_DOCUMENTS = f"""
+INSERT INTO {SEARCH_TABLE} (task_id, document)
+SELECT task.id,
+       setweight(to_tsvector('simple', coalesce(task.title, '')), 'A') ||
+       setweight(to_tsvector('simple', coalesce(task.description, '')), 'B') ||
+       setweight(to_tsvector('simple', coalesce((SELECT string_agg(content, ' ') FROM task_comment
+                                                 WHERE task_comment.task_id = task.id), '')), 'C')
+FROM task
+"""
+
+sqlite_index = table(SEARCH_TABLE, column('rowid'))
+postgres_index = table(SEARCH_TABLE, column('task_id'), column('document'))
+
+
+def create_search_index(connection):
+    ddl = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(connection.dialect.name, ())
+    for statement in ddl:
+        connection.execute(text(statement))
+
+
+def drop_search_index(connection):
+    if connection.dialect.name in SEARCH_DIALECTS:
+        connection.execute(text(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+
+
+def refresh_search_index(connection, task_ids=None):
+    """Rewrite the index rows of ``task_ids`` from the task and comment
+    tables, or of every task when ``task_ids`` is None. Ids of deleted
+    tasks just lose their row."""
+    dialect = connection.dialect.name
+    if dialect not in SEARCH_DIALECTS:
+        return
+    if dialect == 'sqlite':
+        key, documents = 'rowid', SQLITE_DOCUMENTS
+    else:
+        key, documents = 'task_id', POSTGRES_DOCUMENTS
+    if task_ids is None:
+        connection.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+        connection.execute(text(documents))
+        return
+    task_ids = sorted(task_ids)
+    for start in range(0, len(task_ids), REFRESH_BATCH_SIZE):
+        params = {'ids': task_ids[start:start + REFRESH_BATCH_SIZE]}
+        delete = text(f'DELETE FROM {SEARCH_TABLE} WHERE {key} IN :ids')
+        insert = text(documents + ' WHERE task.id IN :ids')
+        for statement in (delete, insert):
+            connection.execute(statement.bindparams(bindparam('ids', expanding=True)), params)
+
+
+def search_terms(query):
+    """Lowercased word tokens of ``query``, at most MAX_TERMS of them."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def search_clauses(dialect, task_id, terms, fallback_columns):
+    """``(from-clause joiner, criterion, score, key)`` matching tasks that
+    contain every term. ``joiner`` takes the select and adds the index to
+    it; higher scores rank first. ``key`` is the task id as the index stores
+    it, which the index can filter and order by without reading the tasks."""
+    *words, last = terms
+    if dialect == 'sqlite':
+        match = ' '.join([f'"{word}"' for word in words] + [f'"{last}"*'])
+        score = -func.bm25(literal_column(SEARCH_TABLE), *SQLITE_WEIGHTS)
+        return (lambda statement: statement.join(sqlite_index, sqlite_index.c.rowid == task_id),
+                literal_column(SEARCH_TABLE).op('MATCH')(match), score, sqlite_index.c.rowid)
+    if dialect == 'postgresql':
+        query = func.to_tsquery('simple', ' & '.join(words + [f'{last}:*']))
+        return (lambda statement: statement.join(postgres_index, postgres_index.c.task_id == task_id),
+                postgres_index.c.document.op('@@')(query),
+                func.ts_rank_cd(postgres_index.c.document, query), postgres_index.c.task_id)
+    # No index: every term has to appear somewhere in the title or description
+    criterion = and_(*[or_(*[func.lower(func.coalesce(c, '')).contains(term, autoescape=True)
+                             for c in fallback_columns])
+                       for term in terms])
+    return lambda statement: statement, criterion, literal_column('0'), task_id
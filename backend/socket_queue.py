@@ -0,0 +1,59 @@
+import threading
+
+import socketio
+
+
+class LoopbackManager(socketio.BaseManager):
+    """Client manager that fans emits out to every LoopbackManager on the
+    same channel in this process.
+
+    Several SocketIO servers in one process (tests, benchmarks) then
+    exchange events the way workers sharing a Redis queue do, without a
+    broker. Delivery is synchronous, and it is not a PubSubManager, so
+    Flask-SocketIO's test client can be used with it. Acknowledgement
+    callbacks stay local to the emitting server.
+    """
+    name = 'loopback'
+
+    _peers = {}
+    _lock = threading.Lock()
+
+    def __init__(self, channel='socketio'):
+        super().__init__()
+        self.channel = channel
+
+    def initialize(self):
+        super().initialize()
+        with self._lock:
+            peers = self._peers.setdefault(self.channel, [])
+            if self not in peers:
+                peers.append(self)
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None,
+             callback=None, **kwargs):
+        if callback is not None or kwargs.get('ignore_queue'):
+            return super().emit(event, data, namespace, room=room,
+                                skip_sid=skip_sid, callback=callback)
+        with self._lock:
+            peers = list(self._peers.get(self.channel, ()))
+        for peer in peers:
+            socketio.BaseManager.emit(peer, event, data, namespace, room=room,
+                                      skip_sid=skip_sid)
+
+
+def socketio_options(config):
+    """SocketIO keyword arguments for the message queue and async mode set in
+    ``config``. ``loopback://`` selects the in-process LoopbackManager; any
+    other URL (``redis://...``, ``amqp://...``) is handed to Flask-SocketIO
+    as its message queue."""
+    options = {}
+    queue_url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL', 'socketio')
+    if queue_url == 'loopback://':
+        options['client_manager'] = LoopbackManager(channel=channel)
+    elif queue_url:
+        options['message_queue'] = queue_url
+        options['channel'] = channel
+    if config.get('SOCKETIO_ASYNC_MODE'):
+        options['async_mode'] = config['SOCKETIO_ASYNC_MODE']
+    return options
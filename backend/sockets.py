@@ -0,0 +1,151 @@
+from flask import current_app
+from flask_socketio import SocketIO, join_room, leave_room
+from sqlalchemy import event
+
+from coalescer import EventCoalescer
+from models import db
+from socket_queue import socketio_options
+
+
+def project_room(project_id):
+    return f'project_{project_id}'
+
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+
+class Realtime:
+    """An app's Socket.IO server, with its emit counters and the coalescer
+    for task updates."""
+
+    def __init__(self, app, registry):
+        self.config = app.config
+        self.socketio = SocketIO(app, cors_allowed_origins="*", **socketio_options(app.config))
+        # Messages delivered per Socket.IO event, i.e. the recipients each
+        # emit reached, so fan-out cost can be read next to the emit count
+        self.emits = registry.counter('socketio_emits_total', 'Socket.IO events emitted.', ('event',))
+        self.deliveries = registry.counter(
+            'socketio_deliveries_total', 'Socket.IO messages delivered, one per recipient.', ('event',))
+        self.task_updates = EventCoalescer(
+            app.config['TASK_UPDATE_COALESCE_MS'] / 1000.0,
+            self.emit_task_batch,
+            self.socketio.start_background_task,
+            self.socketio.sleep
+        )
+        for name, handler in SOCKET_HANDLERS.items():
+            self.socketio.on_event(name, handler)
+
+    def broadcast(self, event_name, data, room):
+        recipients = len(self.socketio.server.manager.rooms.get('/', {}).get(room, ()))
+        self.emits.inc(event=event_name)
+        self.deliveries.inc(recipients, event=event_name)
+        self.socketio.emit(event_name, data, to=room)
+
+    def emit_task_batch(self, room, sequence, tasks):
+        self.broadcast('tasks_updated', {'tasks': tasks, 'seq': sequence}, room)
+
+    def queue_task_update(self, task_payload):
+        room = project_room(task_payload['project_id'])
+        if self.config['TASK_UPDATE_COALESCE_MS'] > 0:
+            self.task_updates.add(room, task_payload['id'], task_payload)
+        else:
+            self.broadcast('task_updated', {'task': task_payload}, room)
+
+    def flush_task_updates(self, updates):
+        # A batch leaves as one tasks_updated message per room right away,
+        # sequenced with any coalesced single-task updates
+        for room, task_id, task_payload in updates:
+            self.task_updates.add(room, task_id, task_payload)
+        for room in {room for room, _, _ in updates}:
+            self.task_updates.flush(room)
+
+
+def init_realtime(app, registry):
+    app.extensions['realtime'] = Realtime(app, registry)
+
+
+def realtime():
+    return current_app.extensions['realtime']
+
+
+def broadcast(event_name, data, room):
+    realtime().broadcast(event_name, data, room)
+
+
+def queue_task_update(task_payload):
+    realtime().queue_task_update(task_payload)
+
+
+# Request handlers queue events on their session; they go out in order from
+# this process once the write commits and are dropped if it rolls back. They
+# bypass the job queue, whose retries and workers in other processes would
+# reorder them against the per-room seq of this process
+def pending_events(session):
+    if not session.in_transaction():
+        session.begin()
+    return session.info.setdefault('realtime_events', [])
+
+
+def broadcast_after_commit(event_name, data, room):
+    pending_events(db.session()).append((broadcast, (event_name, data, room)))
+
+
+def queue_task_update_after_commit(task_payload):
+    pending_events(db.session()).append((queue_task_update, (task_payload,)))
+
+
+def flush_task_updates_after_commit(updates):
+    pending_events(db.session()).append((flush_task_updates, (updates,)))
+
+
+def flush_task_updates(updates):
+    realtime().flush_task_updates(updates)
+
+
+@event.listens_for(db.session, 'after_commit')
+def send_events(session):
+    for send, args in session.info.pop('realtime_events', ()):
+        # The write is committed either way; a lost event is not retried
+        try:
+            send(*args)
+        except Exception:
+            current_app.logger.exception('Sending %s failed', send.__name__)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def drop_events(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('realtime_events', None)
+
+
+def handle_connect(auth=None):
+    # Clients pass {'user_id': ...} as auth data to receive their own
+    # assignment notifications
+    if auth and auth.get('user_id'):
+        join_room(user_room(auth['user_id']))
+    print('Client connected')
+
+
+def handle_disconnect():
+    print('Client disconnected')
+
+
+def handle_join_project(data):
+    room = project_room(data['project_id'])
+    join_room(room)
+    print(f'Client joined room: {room}')
+
+
+def handle_leave_project(data):
+    room = project_room(data['project_id'])
+    leave_room(room)
+    print(f'Client left room: {room}')
+
+
+SOCKET_HANDLERS = {
+    'connect': handle_connect,
+    'disconnect': handle_disconnect,
+    'join_project': handle_join_project,
+    'leave_project': handle_leave_project
+}
@@ -0,0 +1,47 @@
+"""GET /api/tasks must run the same number of SQL statements however many
+tasks it lists, so a lazy load per task shows up as a failure."""
+import pytest
+from sqlalchemy import event
+
+from factory import create_app
+from generate_data import generate
+from models import db
+
+TASKS = 100
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "tasks.db"}',
+                      'CACHE_TTL_SECONDS': 0})
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def listing_statements(app, tasks, url):
+    with app.app_context():
+        generate(tasks=tasks, progress=lambda line: None)
+        db.session.remove()
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            response = app.test_client().get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    assert len(response.get_json()) == tasks
+    return len(statements)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/tasks',
+    '/api/tasks?fields=id,title,assignee_name,comment_count,time_spent',
+    '/api/tasks?order_by=updated_at'
+])
+def test_task_listing_statements_do_not_grow_with_tasks(app, url):
+    assert listing_statements(app, TASKS, url) == listing_statements(app, 10 * TASKS, url)
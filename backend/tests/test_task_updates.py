@@ -0,0 +1,79 @@
+"""Single task updates are conditional on the task's version and validated
+like bulk items; moves and status changes keep each board column in rank
+order."""
+import pytest
+
+from factory import create_app, initialize_database
+from models import db
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "tasks.db"}',
+                      'CACHE_TTL_SECONDS': 0, 'TASK_UPDATE_COALESCE_MS': 0, 'JOB_WORKERS': 0})
+    initialize_database(app)
+    yield app.test_client()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def create_tasks(client, count):
+    project_id = client.post('/api/projects', json={'name': 'Board'}).get_json()['id']
+    return [client.post('/api/tasks', json={'title': f'Task {n}', 'project_id': project_id}).get_json()
+            for n in range(count)]
+
+
+def column(client, task, status='todo'):
+    tasks = client.get(f'/api/tasks?project_id={task["project_id"]}&order_by=rank').get_json()
+    return [t['id'] for t in tasks if t['status'] == status]
+
+
+def test_stale_version_gets_409_with_current_task(client):
+    task, = create_tasks(client, 1)
+    url = f'/api/tasks/{task["id"]}'
+    assert client.put(url, json={'title': 'First'}, headers={'If-Match': '"1"'}).status_code == 200
+
+    response = client.put(url, json={'title': 'Second'}, headers={'If-Match': '"1"'})
+    assert response.status_code == 409
+    assert response.get_json()['task']['title'] == 'First'
+    assert response.get_json()['task']['version'] == 2
+
+
+def test_weak_if_match_gets_400(client):
+    task, = create_tasks(client, 1)
+    response = client.put(f'/api/tasks/{task["id"]}', json={'title': 'New'}, headers={'If-Match': 'W/"1"'})
+    assert response.status_code == 400
+    # Nothing was written, so the strong tag still matches
+    assert client.put(f'/api/tasks/{task["id"]}', json={'title': 'New'},
+                      headers={'If-Match': '"1"'}).status_code == 200
+
+
+@pytest.mark.parametrize('body', [{'status': 'bogus'}, {'priority': 'urgent'}, {'assignee_id': 9999}])
+def test_invalid_fields_get_400(client, body):
+    task, = create_tasks(client, 1)
+    assert client.put(f'/api/tasks/{task["id"]}', json=body).status_code == 400
+
+
+def test_move_between_neighbours(client):
+    first, second, third = create_tasks(client, 3)
+    response = client.post(f'/api/tasks/{third["id"]}/move',
+                           json={'after_id': first['id'], 'before_id': second['id']})
+    assert response.status_code == 200
+    assert column(client, first) == [first['id'], third['id'], second['id']]
+
+
+def test_move_with_reversed_neighbours_gets_400(client):
+    first, second, third = create_tasks(client, 3)
+    response = client.post(f'/api/tasks/{third["id"]}/move',
+                           json={'after_id': second['id'], 'before_id': first['id']})
+    assert response.status_code == 400
+    assert client.get('/api/jobs').get_json()['queued'] == 0
+
+
+def test_status_change_puts_task_last_in_new_column(client):
+    first, second, third = create_tasks(client, 3)
+    # Ranked above the others in the old column, last in the new one
+    client.post(f'/api/tasks/{third["id"]}/move', json={'before_id': first['id']})
+    for task in (first, second, third):
+        client.put(f'/api/tasks/{task["id"]}', json={'status': 'in_progress'})
+    assert column(client, first, 'in_progress') == [first['id'], second['id'], third['id']]
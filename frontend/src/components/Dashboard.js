@@ -53,9 +53,9 @@ export default function Dashboard() {
     try {
       const [statsRes, tasksRes, projectsRes, usersRes] = await Promise.all([
         axios.get('/api/dashboard/stats'),
-        axios.get('/api/tasks'),
-        axios.get('/api/projects'),
-        axios.get('/api/users'),
+        axios.get('/api/tasks', { params: { fields: 'id,title,status,assignee_id,assignee_name,due_date,created_at' } }),
+        axios.get('/api/projects', { params: { fields: 'id,name,description,owner_id,created_at' } }),
+        axios.get('/api/users', { params: { fields: 'id,name' } }),
       ]);
       setStats(statsRes.data);
       setTasks(tasksRes.data);
@@ -68,9 +68,9 @@ function KanbanBoard() {
   const fetchData = async () => {
     try {
       const [tasksRes, projectsRes, usersRes] = await Promise.all([
-        axios.get('/api/tasks'),
-        axios.get('/api/projects'),
-        axios.get('/api/users')
+        axios.get('/api/tasks', { params: { fields: 'id,title,description,status,priority,project_id,assignee_id,due_date,rank' } }),
+        axios.get('/api/projects', { params: { fields: 'id,name' } }),
+        axios.get('/api/users', { params: { fields: 'id,name' } })
       ]);
       
       setTasks(tasksRes.data);
@@ -138,9 +138,9 @@ function KanbanBoard() {
     }
   };
 
-  const handleStatusChange = async (taskId, newStatus) => {
+  const handleStatusChange = async (taskId, newStatus, neighbours = {}) => {
     try {
-      await axios.put(`/api/tasks/${taskId}`, { status: newStatus });
+      await axios.post(`/api/tasks/${taskId}/move`, { status: newStatus, ...neighbours });
       fetchData();
       setSuccess('Task status updated!');
       setTimeout(() => setSuccess(''), 3000);
@@ -153,6 +153,11 @@ function KanbanBoard() {
     ? tasks 
     : tasks.filter(task => task.project_id === parseInt(selectedProject));
 
+  // Ranks compare as plain strings; equal ones fall back to id like the API
+  const columnTasks = (status) => filteredTasks
+    .filter(t => t.status === status)
+    .sort((a, b) => (a.rank < b.rank ? -1 : a.rank > b.rank ? 1 : a.id - b.id));
+
   const columns = [
     { id: 'todo', title: 'To Do', color: '#ff9800' },
     { id: 'in_progress', title: 'In Progress', color: '#2196f3' },
@@ -181,10 +186,20 @@ function KanbanBoard() {
 
   const onDragEnd = async (result) => {
     const { destination, source, draggableId } = result;
-    if (!destination || destination.droppableId === source.droppableId) return;
+    if (!destination) return;
+    if (destination.droppableId === source.droppableId && destination.index === source.index) return;
     const taskId = parseInt(draggableId);
+    const task = tasks.find(t => t.id === taskId);
     const newStatus = destination.droppableId;
-    await handleStatusChange(taskId, newStatus);
+    // Neighbours must be in the task's own project, which matters on the
+    // all-projects board
+    const others = columnTasks(newStatus).filter(t => t.id !== taskId);
+    const above = others.slice(0, destination.index).reverse().find(t => t.project_id === task.project_id);
+    const below = others.slice(destination.index).find(t => t.project_id === task.project_id);
+    await handleStatusChange(taskId, newStatus, {
+      ...(above && { after_id: above.id }),
+      ...(below && { before_id: below.id })
+    });
   };
 
   const handleAddComment = () => {
@@ -259,7 +274,7 @@ function KanbanBoard() {
             {columns.map((col) => (
               <Grid item xs={12} md={4} key={col.id}>
                 <Typography variant="h6" sx={{ color: col.color, mb: 1 }}>
-                  {col.title} ({filteredTasks.filter(t => t.status === col.id).length})
+                  {col.title} ({columnTasks(col.id).length})
                 </Typography>
                 <Droppable droppableId={col.id}>
                   {(provided, snapshot) => (
@@ -275,7 +290,7 @@ function KanbanBoard() {
                         transition: 'background 0.2s',
                       }}
                     >
-                      {filteredTasks.filter(t => t.status === col.id).map((task, idx) => (
+                      {columnTasks(col.id).map((task, idx) => (
                         <Draggable draggableId={task.id.toString()} index={idx} key={task.id}>
                           {(provided, snapshot) => (
                             <Card